@@ -0,0 +1,15 @@
+# https://docs.python.org/3/library/itertools.html
+from itertools import islice
+
+
+def iter_chunks(sents, size):
+    """Split an iterable of sentences into lists of at most size sentences.
+
+    sents -- iterable of sentences.
+    size -- number of sentences per list.
+    """
+    sents = iter(sents)
+    chunk = list(islice(sents, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(sents, size))
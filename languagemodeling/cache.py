@@ -0,0 +1,73 @@
+# https://docs.python.org/3/library/collections.html
+from collections import namedtuple, OrderedDict
+
+
+CacheInfo = namedtuple('CacheInfo', 'hits misses maxsize currsize')
+
+
+class LRUCache(object):
+    """Memo of at most maxsize values that evicts the least recently used one,
+    counting hits and misses like functools.lru_cache. Unlike lru_cache it
+    can be pickled along with the model and cleared selectively.
+    """
+
+    def __init__(self, maxsize):
+        """
+        maxsize -- maximum number of values kept.
+        """
+        assert maxsize > 0
+        self.maxsize = maxsize
+        self.values = OrderedDict()
+        self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self.values)
+
+    def __contains__(self, key):
+        return key in self.values
+
+    def get(self, key, default=None):
+        """Return the value for key, marking it as recently used, or default
+        if it is not cached.
+
+        key -- the key.
+        default -- value returned for a miss.
+        """
+        values = self.values
+        try:
+            value = values[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        values.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def __setitem__(self, key, value):
+        values = self.values
+        values[key] = value
+        values.move_to_end(key)
+        if len(values) > self.maxsize:
+            values.popitem(last=False)
+
+    def __delitem__(self, key):
+        del self.values[key]
+
+    def discard(self, stale):
+        """Drop the values whose keys satisfy a condition.
+
+        stale -- function from keys to booleans.
+        """
+        values = self.values
+        for key in [key for key in values if stale(key)]:
+            del values[key]
+
+    def clear(self):
+        """Drop all the values and reset the statistics."""
+        self.values.clear()
+        self.hits = self.misses = 0
+
+    def info(self):
+        """Return the hit/miss statistics as a CacheInfo."""
+        return CacheInfo(self.hits, self.misses, self.maxsize,
+                         len(self.values))
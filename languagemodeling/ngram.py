@@ -1,23 +1,676 @@
 # https://docs.python.org/3/library/collections.html
 from collections import defaultdict
+from functools import partial
+from itertools import chain, islice, repeat, tee
+# https://docs.python.org/3/library/multiprocessing.html
+from multiprocessing import Pool
+from math import log2
+import pickle
+from tempfile import TemporaryDirectory
+
+# https://docs.scipy.org/doc/numpy/reference/
+import numpy as np
+
+from corpus.util import iter_chunks
+from languagemodeling.cache import LRUCache
+from languagemodeling.packed import Vocabulary, PackedCounts, CountChunks
+from languagemodeling.packed import MAGIC
+from languagemodeling.packed import ngram_windows, quantize
+
+
+# most sentences per shard when counting in parallel without a chunk size.
+SHARD_SIZE = 10000
+# shards per worker when the number of sentences is known, so that the
+# workers share the corpus even if it is smaller than SHARD_SIZE.
+SHARDS_PER_WORKER = 4
 
 
 class NGram(object):
 
-    def __init__(self, n, sents):
+    def __init__(self, n, sents, packed=False, chunk_size=None, workers=None,
+                 cache_size=None, shard_size=None):
         """
         n -- order of the model.
-        sents -- list of sentences, each one being a list of tokens.
+        sents -- iterable of sentences, each one being a list of tokens.
+        packed -- store the counts in integer-encoded, array-backed tables
+            (see languagemodeling.packed) instead of a dict of token tuples.
+        chunk_size -- count this many sentences at a time, flushing the
+            partial counts to disk as sorted chunks that are merged at the
+            end, so memory does not grow with the corpus (implies packed).
+        workers -- count shards of the corpus in this many processes and
+            merge their counts.
+        cache_size -- memoize the last this many results of prob() in an
+            LRUCache (see cache_info()).
+        shard_size -- sentences per shard when counting in parallel
+            (default: chunk_size, or see default_shard_size()).
         """
         assert n > 0
         self.n = n
-        self.counts = counts = defaultdict(int)
+        self.cache = LRUCache(cache_size) if cache_size else None
+        self.index = {}
+        packed = packed or chunk_size
+
+        # partial count tables to be merged
+        if workers and workers > 1:
+            shard_size = (shard_size or chunk_size or
+                          default_shard_size(sents, workers))
+            tables = count_parallel(n, sents, workers, shard_size)
+            if packed:
+                vocab = Vocabulary()
+                tables = map(vocab.encode_counts, tables)
+        elif packed:
+            vocab = Vocabulary()
+            sents = map(vocab.encode, sents)
+            if chunk_size:
+                tables = (count_ngrams(n, chunk)
+                          for chunk in iter_chunks(sents, chunk_size))
+            else:
+                tables = [count_ngrams(n, sents)]
+        else:
+            tables = [count_ngrams(n, sents)]
+
+        if not chunk_size:
+            counts = merge_counts(tables)
+            if packed:
+                counts = PackedCounts.from_id_counts(vocab, counts)
+            self.counts = counts
+            return
+
+        with TemporaryDirectory() as directory:
+            chunks = CountChunks(directory)
+            for table in tables:
+                chunks.flush(table)
+            self.counts = PackedCounts.from_chunks(vocab, chunks)
+
+    def save(self, filename):
+        """Save the model in the binary format of languagemodeling.packed,
+        which load() memory-maps instead of reading.
+
+        filename -- the file name.
+        """
+        counts = self.counts
+        if not isinstance(counts, PackedCounts):
+            counts = PackedCounts.from_counts(counts)
+        with open(filename, 'wb') as f:
+            counts.save(f, **self.header())
+
+    def header(self):
+        """Values other than the counts that save() stores in the header of
+        the file.
+        """
+        return {'n': self.n}
+
+    def restore(self, header):
+        """Set the values stored in the header of a file by save().
+
+        header -- dict read from the file.
+        """
+        self.n = header['n']
+
+    @classmethod
+    def load(cls, filename, cache_size=None):
+        """Open a model saved with save(). The counts are queried directly
+        from the memory-mapped file, so processes opening the same file share
+        its pages.
+
+        filename -- the file name.
+        cache_size -- as in __init__.
+        """
+        counts, header = PackedCounts.load(filename)
+        model = cls.__new__(cls)
+        model.counts = counts
+        model.cache = LRUCache(cache_size) if cache_size else None
+        model.index = {}
+        model.restore(header)
+        return model
+
+    def __getstate__(self):
+        # the continuation index is rebuilt on demand
+        state = dict(self.__dict__)
+        state['index'] = {}
+        return state
+
+    def cache_info(self):
+        """Return the hit/miss statistics of the prob() cache, or None if the
+        model has no cache.
+        """
+        if self.cache is not None:
+            return self.cache.info()
+
+    def update(self, sents):
+        """Add the counts of more sentences to the model. Only the cached
+        probabilities of the contexts that got new n-grams are dropped.
+
+        sents -- iterable of sentences, each one being a list of tokens.
+        """
+        n = self.n
+        counts = self.counts
+
+        if isinstance(counts, PackedCounts):
+            vocab = counts.vocab
+            new_counts = count_ngrams(n, map(vocab.encode, sents))
+            counts.update(new_counts)
+            contexts = {tuple(vocab.tokens[i] for i in ngram[:-1])
+                        for ngram in new_counts if len(ngram) == n}
+        else:
+            new_counts = count_ngrams(n, sents)
+            for ngram, c in new_counts.items():
+                counts[ngram] += c
+            contexts = {ngram[:-1] for ngram in new_counts if len(ngram) == n}
+
+        self.index = {}
+        if self.cache is not None:
+            self.cache.discard(lambda key: key[1] in contexts)
+
+    def prune(self, cutoffs, renormalize=True):
+        """Drop the n-grams seen less than a minimum number of times.
+
+        cutoffs -- list with the minimum count of the kept k-grams for each
+            order k = 1, ..., n. Orders past its end are not pruned.
+        renormalize -- subtract the dropped counts from their contexts, so
+            the model still normalizes (contexts left without n-grams become
+            unseen). Otherwise the contexts keep their counts, for smoothed
+            models to give the dropped mass to lower orders.
+        """
+        n = self.n
+        if len(cutoffs) < n:
+            return
+        cutoff = cutoffs[n - 1]
+        counts = self.counts
+
+        if isinstance(counts, PackedCounts):
+            counts.prune(n, cutoff, renormalize)
+        else:
+            pruned = [(g, c) for g, c in counts.items()
+                      if len(g) == n and c < cutoff]
+            for ngram, c in pruned:
+                del counts[ngram]
+                if renormalize:
+                    prev_tokens = ngram[:-1]
+                    counts[prev_tokens] -= c
+                    if not counts[prev_tokens]:
+                        del counts[prev_tokens]
+
+        self.index = {}
+        if self.cache is not None:
+            self.cache.clear()
+
+    def continuations(self, prev_tokens):
+        """Return a dict with the tokens seen after a context and the counts
+        of the n-grams they form with it.
+
+        prev_tokens -- the n-1 previous tokens.
+        """
+        assert len(prev_tokens) == self.n - 1
+        return self.table_continuations('counts', tuple(prev_tokens))
+
+    def table_continuations(self, name, context):
+        """Continuations of a context in a count table. Packed tables find
+        them in the contiguous range of keys with the context as prefix;
+        dict tables build an index of the contexts of that length the first
+        time, kept until the counts change.
+
+        name -- attribute name of the count table.
+        context -- tuple of tokens.
+        """
+        table = getattr(self, name)
+        if isinstance(table, PackedCounts):
+            return table.continuations(context)
+
+        length = len(context) + 1
+        key = (name, length)
+        index = self.index.get(key)
+        if index is None:
+            index = self.index[key] = defaultdict(dict)
+            for gram, c in table.items():
+                if len(gram) == length and c:
+                    index[gram[:-1]][gram[-1]] = c
+        return dict(index.get(context, ()))
+
+    def prob(self, token, prev_tokens=None):
+        n = self.n
+        if not prev_tokens:
+            prev_tokens = []
+        assert len(prev_tokens) == n - 1
+
+        cache = self.cache
+        if cache is not None:
+            key = (token, tuple(prev_tokens))
+            p = cache.get(key)
+            if p is None:
+                p = cache[key] = self._prob(token, prev_tokens)
+            return p
+
+        return self._prob(token, prev_tokens)
+
+    def _prob(self, token, prev_tokens):
+        # get() does not add the unseen n-grams to a defaultdict
+        prev_tokens = tuple(prev_tokens)
+        counts = self.counts
+        c = counts.get(prev_tokens + (token,), 0)
+        return float(c) / counts.get(prev_tokens, 0)
+
+    def sents_log_prob(self, sents):
+        """Log-probability (base 2) of each sentence of a batch, the sum of
+        the log-probabilities of its n-grams. A sentence with an unseen
+        n-gram gets -inf. Packed models score the whole batch with array
+        operations.
+
+        sents -- iterable of sentences, each one being a list of tokens.
+        """
+        n = self.n
+        counts = self.counts
+
+        if not isinstance(counts, PackedCounts):
+            result = []
+            for sent in sents:
+                log_prob = 0.0
+                for ngram in windows(sent, n):
+                    c = counts.get(ngram, 0)
+                    if c:
+                        log_prob += log2(c / counts[ngram[:-1]])
+                    else:
+                        log_prob = float('-inf')
+                result.append(log_prob)
+            return result
+
+        ids, lengths = counts.vocab.encode_batch(sents)
+        ngrams, index = ngram_windows(ids, lengths, n)
+        c = counts.count_array(ngrams)
+        prev_c = counts.count_array(ngrams[:, :-1])
+        with np.errstate(divide='ignore'):
+            log_probs = np.log2(c) - np.log2(np.maximum(prev_c, 1))
+        return np.bincount(index, weights=log_probs,
+                           minlength=len(lengths)).tolist()
+
+    def scored_tokens(self, sent):
+        """Number of tokens whose log-probabilities sents_log_prob() adds up
+        for a sentence.
+
+        sent -- the sentence.
+        """
+        return max(len(sent) - self.n + 1, 0)
+
+    def backoff_form(self):
+        """Return the model in back-off form: a tuple (log_probs, log_weights,
+        lowest, base). log_probs has the log-probability (base 2) of every
+        n-gram. The unsmoothed model does not back off, so log_weights is
+        empty, lowest is n and base is 0.
+        """
+        n = self.n
+        counts = self.counts
+        log_probs = {g: log2(c / counts[g[:-1]])
+                     for g, c in counts.items() if len(g) == n and c}
+        return log_probs, {}, n, 0.0
+
+
+class KneserNeyNGram(NGram):
+    """Interpolated modified Kneser-Ney (Chen and Goodman, 1998).
+
+    The highest order uses the n-gram counts and the lower orders use
+    continuation counts (number of distinct tokens seen before a k-gram),
+    with three discounts per order estimated from the count-of-counts.
+    Sentences are padded with n-1 '<s>' and one '</s>'.
+    """
+
+    def __init__(self, n, sents, packed=False, chunk_size=None, workers=None,
+                 cache_size=None, shard_size=None):
+        """
+        n -- order of the model.
+        sents -- iterable of sentences, each one being a list of tokens.
+        packed, chunk_size, workers, cache_size, shard_size -- as in NGram.
+            Packed models also keep the continuation tables packed.
+        """
+        if workers and workers > 1 and not (shard_size or chunk_size):
+            # the padded sentences below have no length
+            shard_size = default_shard_size(sents, workers)
+        sents = (pad(sent, n) for sent in sents)
+        super().__init__(n, sents, packed, chunk_size, workers, cache_size,
+                         shard_size)
+        self.cutoffs = ()
+        if not isinstance(self.counts, PackedCounts):
+            # the vocabulary, which pruning does not shrink (packed counts
+            # keep it in their Vocabulary)
+            self.tokens = {g[-1] for g in self.counts if len(g) == n}
+        self.count_continuations()
+        self.set_statistics(self.table_coc, self.table_v)
+
+    def header(self):
+        header = super().header()
+        header.update(cutoffs=list(self.cutoffs), coc=self.coc, v=self.v)
+        return header
+
+    def restore(self, header):
+        super().restore(header)
+        self.cutoffs = tuple(header.get('cutoffs', ()))
+        self.count_continuations(self.cutoffs)
+        # the statistics of a pruned model come from the unpruned one, so
+        # they can not be computed again from the counts
+        self.set_statistics(header.get('coc', self.table_coc),
+                            header.get('v', self.table_v))
+
+    def set_statistics(self, coc, v):
+        """Set the count-of-counts the discounts are estimated from and the
+        vocabulary size.
+
+        coc -- list with the number of k-grams seen 1, 2, 3 and 4 times for
+            each order k = 0, ..., n.
+        v -- number of tokens that can be predicted.
+        """
+        self.coc = coc
+        self.v = v
+        self.discounts = [discounts(c) for c in coc]
+
+    def update(self, sents):
+        """Add the counts of more sentences to the model and compute the
+        continuation counts again, with the cutoffs of the last prune() if
+        any (the new n-grams themselves are not pruned). The discounts and
+        lower orders change, so the whole cache is dropped.
+
+        The count-of-counts of a pruned model, which are those of the
+        unpruned one, get the changes that the new counts make to the pruned
+        tables. That is exact for unpruned models, and only misses the
+        pruned n-grams seen again otherwise. The vocabulary grows with the
+        new tokens.
+
+        sents -- iterable of sentences, each one being a list of tokens.
+        """
+        n = self.n
+        sents = [pad(sent, n) for sent in sents]
+        old_coc = self.table_coc
+        super().update(sents)
+        if not isinstance(self.counts, PackedCounts):
+            self.tokens.update(t for sent in sents for t in sent[n - 1:])
+        self.count_continuations(self.cutoffs)
+        coc = [[c + new - old for c, new, old in zip(*counts)]
+               for counts in zip(self.coc, self.table_coc, old_coc)]
+        self.set_statistics(coc, self.vocabulary_size())
+
+    def vocabulary_size(self):
+        """Number of tokens seen in training, '</s>' included and '<s>' not,
+        whether pruned or not.
+        """
+        counts = self.counts
+        if isinstance(counts, PackedCounts):
+            ids = counts.vocab.ids
+            return len(ids) - ('<s>' in ids)
+        return len(self.tokens)
+
+    def prune(self, cutoffs):
+        """Prune the n-gram counts, and the lower-order continuation counts,
+        with the cutoffs of their orders. The mass of the dropped k-grams goes
+        to the (k-1)-order distribution, like the discounted mass.
+
+        The continuation counts are computed again from the kept n-grams, so
+        pruning the highest order also lowers the continuation counts of
+        the lower ones. The discounts of every order and the vocabulary size
+        are those of the unpruned model, since the count-of-counts of the
+        pruned tables no longer estimate them.
 
+        cutoffs -- list with the minimum count of the kept k-grams for each
+            order k = 1, ..., n. Orders past its end are not pruned.
+        """
+        coc, v = self.coc, self.v
+        super().prune(cutoffs, renormalize=False)
+        self.count_continuations(cutoffs)
+        self.cutoffs = cutoffs
+        self.set_statistics(coc, v)
+
+    def count_continuations(self, cutoffs=()):
+        """Compute the continuation counts and context statistics from the
+        n-gram counts, in a single pass over the n-grams. Also sets the
+        count-of-counts (of counts 1 to 4) of each order in table_coc and the
+        number of unigrams in table_v, for set_statistics().
+
+        cutoffs -- minimum continuation counts for each order, as in prune().
+        """
+        n = self.n
+        counts = self.counts
+        packed = isinstance(counts, PackedCounts)
+        if packed:
+            ngrams = counts.id_items(n)
+        else:
+            ngrams = ((g, c) for g, c in counts.items() if len(g) == n and c)
+
+        # continuation counts of the lower-order k-grams (k < n)
+        cont = defaultdict(int)
+        # totals of the lower-order contexts (the highest order uses counts)
+        totals = defaultdict(int)
+        # number of continuations of each context seen 1, 2 and 3+ times
+        types = (defaultdict(int), defaultdict(int), defaultdict(int))
+        # mass of the pruned k-grams of each context
+        pruned = defaultdict(int)
+        # count-of-counts per order, for the discounts
+        coc = [defaultdict(int) for k in range(n + 1)]
+
+        for ngram, c in ngrams:
+            types[min(c, 3) - 1][ngram[:-1]] += 1
+            pruned[ngram[:-1]] -= c  # the context count is added below
+            coc[n][c] += 1
+            # each new (k+1)-gram suffix adds one to the count of its
+            # k-gram suffix. if it is not new, neither are the shorter ones.
+            for k in range(n - 1, 0, -1):
+                suffix = ngram[-k:]
+                new = suffix not in cont
+                cont[suffix] += 1
+                if not new:
+                    break
+
+        # the contexts of pruned n-grams kept their counts
+        if packed:
+            contexts = counts.id_items(n - 1)
+        else:
+            contexts = ((g, c) for g, c in counts.items() if len(g) == n - 1)
+        for context, c in contexts:
+            pruned[context] += c
+            if not pruned[context]:
+                del pruned[context]
+
+        for kgram, c in list(cont.items()):
+            k = len(kgram)
+            coc[k][c] += 1
+            totals[kgram[:-1]] += c
+            if k <= len(cutoffs) and c < cutoffs[k - 1]:
+                pruned[kgram[:-1]] += c
+                del cont[kgram]
+            else:
+                types[min(c, 3) - 1][kgram[:-1]] += 1
+
+        if packed:
+            def freeze(table):
+                return PackedCounts.from_id_counts(counts.vocab, table)
+        else:
+            freeze = dict
+        self.cont = freeze(cont)
+        self.totals = freeze(totals)
+        self.types = tuple(freeze(t) for t in types)
+        self.pruned = freeze(pruned)
+        self.table_coc = [[coc[k].get(r, 0) for r in range(1, 5)]
+                          for k in range(n + 1)]
+        # number of unigrams
+        self.table_v = sum(coc[1].values())
+
+        self.index = {}
+        if self.cache is not None:
+            self.cache.clear()
+
+    def V(self):
+        """Number of tokens that can be predicted ('</s>' included)."""
+        return self.v
+
+    def _prob(self, token, prev_tokens):
+        return self.order_prob(token, tuple(prev_tokens))
+
+    def continuations(self, context):
+        """Return a dict with the tokens seen after a context and their
+        counts under the distribution of order k: n-gram counts for the
+        highest order and continuation counts for the lower ones.
+
+        context -- tuple of k-1 tokens, k <= n.
+        """
+        name = 'counts' if len(context) == self.n - 1 else 'cont'
+        return self.table_continuations(name, tuple(context))
+
+    def order_prob(self, token, context):
+        """Probability of a token under the distribution of order k, given a
+        context of k-1 tokens.
+
+        token -- the token.
+        context -- tuple of k-1 tokens, k <= n.
+        """
+        n = self.n
+        m = len(context) + 1
+        counts, cont, totals = self.counts, self.cont, self.totals
+
+        # from the uniform distribution up to order m
+        p = 1.0 / self.v
+        for k in range(1, m + 1):
+            context_k = context[m - k:]
+            if k == n:
+                c = counts.get(context_k + (token,), 0)
+                total = counts.get(context_k, 0)
+            else:
+                c = cont.get(context_k + (token,), 0)
+                total = totals.get(context_k, 0)
+            if not total:
+                # unseen context: all the mass goes to the lower order
+                continue
+            p = (max(c - self.discounts[k][min(c, 3) - 1], 0) if c else 0) / \
+                total + self.gamma(k, context_k, total) * p
+        return p
+
+    def gamma(self, k, context, total):
+        """Weight of the order k-1 distribution in the order k distribution
+        for a context: the discounted and pruned mass over the total.
+
+        k -- the order.
+        context -- tuple of k-1 tokens.
+        total -- count (or continuation count) of the context.
+        """
+        d = self.discounts[k]
+        types = self.types
+        mass = sum(d[i] * types[i].get(context, 0) for i in range(3))
+        return (mass + self.pruned.get(context, 0)) / total
+
+    def backoff_form(self):
+        """Return the model in back-off form: a tuple (log_probs, log_weights,
+        lowest, base). log_probs has the log-probability (base 2) of every
+        stored k-gram under the order k distribution, log_weights has the
+        log-weight of the lower order for every seen context, lowest is the
+        lowest order and base the probability of a token unseen at it.
+        """
+        n = self.n
+        counts, cont, totals = self.counts, self.cont, self.totals
+        if n > 1:
+            kgrams = chain(((g, c) for g, c in counts.items() if len(g) == n),
+                           cont.items())
+        else:
+            kgrams = ((g, c) for g, c in counts.items() if len(g) == n)
+        contexts = chain(
+            ((g, c) for g, c in counts.items() if len(g) == n - 1),
+            totals.items())
+
+        log_probs = {g: log2(self.order_prob(g[-1], g[:-1]))
+                     for g, c in kgrams if c}
+        log_weights = {}
+        for context, total in contexts:
+            if total:
+                gamma = self.gamma(len(context) + 1, context, total)
+                log_weights[context] = log2(gamma) if gamma else float('-inf')
+        return log_probs, log_weights, 1, 1.0 / self.v
+
+    def sents_log_prob(self, sents):
+        """Log-probability (base 2) of each sentence of a batch, padding it
+        as in training.
+
+        sents -- iterable of sentences, each one being a list of tokens.
+        """
+        n = self.n
+        prob = self.prob
+        result = []
         for sent in sents:
-            for i in range(len(sent) - n + 1):
-                ngram = tuple(sent[i: i + n])
-                counts[ngram] += 1
-                counts[ngram[:-1]] += 1
+            log_prob = 0.0
+            for ngram in windows(padded(sent, n), n):
+                log_prob += log2(prob(ngram[-1], ngram[:-1]))
+            result.append(log_prob)
+        return result
+
+    def scored_tokens(self, sent):
+        return len(sent) + 1
+
+
+class QuantizedNGram(object):
+    """Read-only n-gram model in back-off form, with the log-probabilities
+    and back-off weights quantized to 8 or 16-bit codes.
+
+    Each k-gram key of a PackedCounts table stores a probability code and,
+    if it is a context, a back-off weight code, decoded on the fly with two
+    codebooks. Probability code 0 means the k-gram is not stored, weight
+    code 0 means weight 1.
+    """
+
+    def __init__(self, model, bits=8):
+        """
+        model -- the NGram (or subclass) to quantize.
+        bits -- bits per code, 8 or 16.
+        """
+        assert bits in (8, 16)
+        log_probs, log_weights, lowest, base = model.backoff_form()
+        self.n = model.n
+        self.padded = isinstance(model, KneserNeyNGram)
+        self.lowest = lowest
+        self.base = base
+        self.bits = bits
+
+        # -99 stands for -inf, as in ARPA files
+        prob_codes, prob_codebook = quantize(
+            np.maximum(list(log_probs.values()), -99.0), bits)
+        weight_codes, weight_codebook = quantize(
+            np.maximum(list(log_weights.values()), -99.0), bits)
+        self.prob_codebook = prob_codebook
+        weight_codebook[0] = 0.0
+        self.weight_codebook = weight_codebook
+
+        values = defaultdict(int)
+        for gram, code in zip(log_probs, prob_codes.tolist()):
+            values[gram] = code
+        for context, code in zip(log_weights, weight_codes.tolist()):
+            values[context] |= code << bits
+
+        vocab = Vocabulary()
+        dtype = np.uint16 if bits == 8 else np.uint32
+        self.codes = PackedCounts.from_id_counts(
+            vocab, vocab.encode_counts(values), dtype)
+
+    def save(self, filename):
+        """Save the model in the binary format of languagemodeling.packed.
+
+        filename -- the file name.
+        """
+        with open(filename, 'wb') as f:
+            self.codes.save(f, n=self.n, padded=self.padded,
+                            lowest=self.lowest, base=self.base,
+                            code_bits=self.bits,
+                            prob_codebook=self.prob_codebook.tolist(),
+                            weight_codebook=self.weight_codebook.tolist())
+
+    @classmethod
+    def load(cls, filename):
+        """Memory-map a model saved with save().
+
+        filename -- the file name.
+        """
+        codes, header = PackedCounts.load(filename)
+        model = cls.__new__(cls)
+        model.codes = codes
+        model.n = header['n']
+        model.padded = header['padded']
+        model.lowest = header['lowest']
+        model.base = header['base']
+        model.bits = header['code_bits']
+        model.prob_codebook = np.array(header['prob_codebook'])
+        model.weight_codebook = np.array(header['weight_codebook'])
+        return model
 
     def prob(self, token, prev_tokens=None):
         n = self.n
@@ -25,5 +678,167 @@ class NGram(object):
             prev_tokens = []
         assert len(prev_tokens) == n - 1
 
-        tokens = prev_tokens + [token]
-        return float(self.counts[tuple(tokens)]) / self.counts[tuple(prev_tokens)]
+        codes = self.codes
+        mask = (1 << self.bits) - 1
+        prev_tokens = tuple(prev_tokens)
+        log_weight = 0.0
+        for k in range(n, self.lowest - 1, -1):
+            context = prev_tokens[n - k:]
+            code = codes[context + (token,)] & mask
+            if code:
+                return 2 ** (log_weight + self.prob_codebook[code])
+            code = codes[context] >> self.bits
+            log_weight += self.weight_codebook[code]
+        return 2 ** log_weight * self.base
+
+    def sents_log_prob(self, sents):
+        """Log-probability (base 2) of each sentence of a batch, padded as
+        in the original model.
+
+        sents -- iterable of sentences, each one being a list of tokens.
+        """
+        n = self.n
+        prob = self.prob
+        result = []
+        for sent in sents:
+            if self.padded:
+                sent = padded(sent, n)
+            log_prob = 0.0
+            for ngram in windows(sent, n):
+                p = prob(ngram[-1], ngram[:-1])
+                log_prob += log2(p) if p else float('-inf')
+            result.append(log_prob)
+        return result
+
+    def scored_tokens(self, sent):
+        if self.padded:
+            return len(sent) + 1
+        return max(len(sent) - self.n + 1, 0)
+
+
+def pad(sent, n):
+    """Add n-1 start markers and one end marker to a sentence.
+
+    sent -- the sentence.
+    n -- order of the model.
+    """
+    return ['<s>'] * (n - 1) + list(sent) + ['</s>']
+
+
+def padded(sent, n):
+    """Iterate over a sentence with n-1 start markers and one end marker,
+    without copying it.
+
+    sent -- the sentence.
+    n -- order of the model.
+    """
+    return chain(repeat('<s>', n - 1), sent, ('</s>',))
+
+
+def windows(tokens, n):
+    """Iterate over the n-grams of a sequence of tokens as tuples, sliding
+    n staggered iterators over it instead of slicing a copy per position.
+
+    tokens -- iterable of tokens.
+    n -- order of the n-grams.
+    """
+    iters = tee(tokens, n)
+    for i, it in enumerate(iters):
+        next(islice(it, i, i), None)
+    return zip(*iters)
+
+
+def discounts(coc):
+    """Modified Kneser-Ney discounts for counts 1, 2 and 3+ (Chen and
+    Goodman, 1998), falling back to a single absolute discount when some
+    count-of-counts is zero.
+
+    coc -- number of n-grams seen 1, 2, 3 and 4 times.
+    """
+    n1, n2, n3, n4 = coc
+    y = n1 / (n1 + 2 * n2) if n1 else 0.5
+    if not (n1 and n2 and n3 and n4):
+        d = (y, y, y)
+    else:
+        d = (1 - 2 * y * n2 / n1, 2 - 3 * y * n3 / n2, 3 - 4 * y * n4 / n3)
+    # keep 0 <= D_r <= r, so no discounted count is negative
+    return tuple(min(max(x, 0.0), r) for r, x in zip((1, 2, 3), d))
+
+
+def load_model(filename, model_class=NGram):
+    """Load a pickled model, or memory-map one saved with NGram.save().
+
+    filename -- the model file.
+    model_class -- class of the model if it was saved with NGram.save().
+    """
+    f = open(filename, 'rb')
+    binary = f.read(len(MAGIC)) == MAGIC
+    f.seek(0)
+    if binary:
+        model = model_class.load(filename)
+    else:
+        model = pickle.load(f)
+    f.close()
+    return model
+
+
+def count_ngrams(n, sents):
+    """Count the n-grams and (n-1)-grams of a list of sentences.
+
+    n -- order of the n-grams.
+    sents -- iterable of sentences, each one being a list of tokens.
+    """
+    counts = defaultdict(int)
+    for sent in sents:
+        for ngram in windows(sent, n):
+            counts[ngram] += 1
+            counts[ngram[:-1]] += 1
+    return counts
+
+
+def count_parallel(n, sents, workers, shard_size):
+    """Count the n-grams of shards of a list of sentences in a process pool.
+    Returns an iterator over the counts of each shard.
+
+    n -- order of the n-grams.
+    sents -- iterable of sentences, each one being a list of tokens.
+    workers -- number of processes.
+    shard_size -- number of sentences per shard.
+    """
+    with Pool(workers) as pool:
+        shards = iter_chunks(sents, shard_size)
+        yield from pool.imap_unordered(partial(count_ngrams, n), shards)
+
+
+def default_shard_size(sents, workers):
+    """Sentences per shard to count a corpus in parallel: SHARDS_PER_WORKER
+    shards per worker if the number of sentences is known, and at most
+    SHARD_SIZE.
+
+    sents -- iterable of sentences.
+    workers -- number of processes.
+    """
+    try:
+        size = len(sents)
+    except TypeError:
+        return SHARD_SIZE
+    shards = workers * SHARDS_PER_WORKER
+    return max(min(-(-size // shards), SHARD_SIZE), 1)
+
+
+def merge_counts(tables):
+    """Add up count tables into the first one (a defaultdict, or a copy of
+    it as one) and return it.
+
+    tables -- iterable of dicts from n-grams to counts.
+    """
+    tables = iter(tables)
+    counts = next(tables, None)
+    if counts is None:
+        return defaultdict(int)
+    if not isinstance(counts, defaultdict):
+        counts = defaultdict(int, counts)
+    for table in tables:
+        for ngram, c in table.items():
+            counts[ngram] += c
+    return counts
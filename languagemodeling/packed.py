@@ -0,0 +1,553 @@
+# https://docs.python.org/3/library/mmap.html
+from array import array
+import heapq
+from itertools import chain, groupby, repeat
+import json
+import mmap
+from operator import itemgetter
+import os
+
+# https://docs.scipy.org/doc/numpy/reference/
+import numpy as np
+
+
+# file format: MAGIC, header length (8 bytes, little-endian), JSON header,
+# then the key and count arrays, each one starting at an 8-byte boundary.
+MAGIC = b'NGRAMPK1'
+
+
+class Vocabulary(object):
+
+    def __init__(self, tokens=()):
+        """
+        tokens -- initial tokens, numbered in order.
+        """
+        self.ids = {}
+        self.tokens = []
+        for token in tokens:
+            self.add(token)
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def add(self, token):
+        """Return the id of a token, assigning a new one if it is unseen.
+
+        token -- the token.
+        """
+        ids = self.ids
+        i = ids.get(token)
+        if i is None:
+            i = ids[token] = len(self.tokens)
+            self.tokens.append(token)
+        return i
+
+    def encode(self, sent):
+        """Convert a sentence to a list of ids, adding unseen tokens.
+
+        sent -- the sentence.
+        """
+        add = self.add
+        return [add(token) for token in sent]
+
+    def encode_counts(self, counts):
+        """Convert a dict of counts keyed by token tuples to one keyed by
+        tuples of ids, adding unseen tokens.
+
+        counts -- dict from tuples of tokens to counts.
+        """
+        encode = self.encode
+        return {tuple(encode(gram)): c for gram, c in counts.items() if c}
+
+    def encode_batch(self, sents):
+        """Convert a batch of sentences to one array of ids, -1 standing for
+        unseen tokens. Returns a pair (ids, lengths of the sentences).
+
+        sents -- iterable of sentences.
+        """
+        sents = list(sents)
+        tokens = chain.from_iterable(sents)
+        ids = np.fromiter(map(self.ids.get, tokens, repeat(-1)),
+                          dtype=np.int64)
+        lengths = np.fromiter(map(len, sents), dtype=np.int64,
+                              count=len(sents))
+        return ids, lengths
+
+    def lookup(self, tokens):
+        """Convert tokens to a tuple of ids, or None if any of them is unseen.
+
+        tokens -- the tokens.
+        """
+        ids = self.ids
+        try:
+            return tuple(ids[token] for token in tokens)
+        except KeyError:
+            return None
+
+
+class PackedCounts(object):
+    """N-gram count table keyed by token ids packed into integers.
+
+    There is one table per n-gram length: a sorted array of packed keys and a
+    parallel array of counts. Looking up an n-gram is a binary search, and
+    missing n-grams count 0 (like a defaultdict(int), without inserting).
+    """
+
+    def __init__(self, vocab, tables, bits=None):
+        """
+        vocab -- the Vocabulary used to encode the n-grams.
+        tables -- dict from n-gram lengths to pairs (keys, counts) of arrays,
+            keys sorted.
+        bits -- bits per token id in the keys (default: enough for vocab).
+        """
+        self.vocab = vocab
+        if bits is None:
+            bits = max(len(vocab) - 1, 1).bit_length()
+        self.bits = bits
+        self.tables = tables
+
+    @classmethod
+    def from_id_counts(cls, vocab, id_counts, dtype=None):
+        """Build the tables from a dict of counts.
+
+        vocab -- the Vocabulary used to encode the n-grams.
+        id_counts -- dict from tuples of token ids to counts.
+        dtype -- type of the stored counts, as in add_table().
+        """
+        self = cls(vocab, {})
+
+        by_length = {}
+        for ids, c in id_counts.items():
+            by_length.setdefault(len(ids), []).append((ids, c))
+
+        for length, entries in by_length.items():
+            ids = np.array([e[0] for e in entries], dtype=np.uint64)
+            ids = ids.reshape(len(entries), length)
+            counts = np.array([e[1] for e in entries], dtype=np.uint64)
+            self.add_table(ids, counts, dtype)
+
+        return self
+
+    @classmethod
+    def from_chunks(cls, vocab, chunks):
+        """Build the tables merging the sorted chunks of a CountChunks.
+
+        vocab -- the Vocabulary used to encode the n-grams.
+        chunks -- the CountChunks.
+        """
+        self = cls(vocab, {})
+
+        for length in chunks.lengths():
+            ids, counts = array('I'), array('Q')
+            for row, c in chunks.merged(length):
+                ids.extend(row)
+                counts.append(c)
+            ids = np.array(ids, dtype=np.uint32).reshape(len(counts), length)
+            counts = np.array(counts, dtype=np.uint64)
+            self.add_table(ids, counts)
+
+        return self
+
+    @classmethod
+    def from_counts(cls, counts):
+        """Build the tables from a dict of counts keyed by token tuples.
+
+        counts -- dict from tuples of tokens to counts.
+        """
+        vocab = Vocabulary()
+        return cls.from_id_counts(vocab, vocab.encode_counts(counts))
+
+    def save(self, f, **header):
+        """Write the tables in the binary format.
+
+        f -- file opened for binary writing.
+        header -- extra values to store in the header.
+        """
+        tables = []
+        offset = 0
+        for length, (keys, counts) in sorted(self.tables.items()):
+            tables.append({
+                'length': length,
+                'size': len(keys),
+                'counts_dtype': counts.dtype.name,
+                'keys_offset': offset,
+                'counts_offset': offset + keys.nbytes,
+            })
+            offset += keys.nbytes + aligned(counts.nbytes)
+        header.update(bits=self.bits, vocab=self.vocab.tokens, tables=tables)
+        data = json.dumps(header).encode('utf-8')
+        data += b' ' * (aligned(len(data)) - len(data))
+
+        f.write(MAGIC)
+        f.write(len(data).to_bytes(8, 'little'))
+        f.write(data)
+        for length, (keys, counts) in sorted(self.tables.items()):
+            f.write(keys.astype('<u8').tobytes())
+            f.write(counts.astype(counts.dtype.newbyteorder('<')).tobytes())
+            f.write(b'\0' * (aligned(counts.nbytes) - counts.nbytes))
+
+    @classmethod
+    def load(cls, filename):
+        """Memory-map a file in the binary format to query it in place.
+        Returns a pair (counts, header).
+
+        filename -- the file name.
+        """
+        with open(filename, 'rb') as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if buf[:len(MAGIC)] != MAGIC:
+            raise ValueError(
+                '{} is not a packed n-gram model'.format(filename))
+        start = len(MAGIC) + 8
+        size = int.from_bytes(buf[len(MAGIC):start], 'little')
+        header = json.loads(buf[start:start + size].decode('utf-8'))
+        start += size
+
+        tables = {}
+        for t in header.pop('tables'):
+            keys = np.frombuffer(buf, dtype='<u8', count=t['size'],
+                                 offset=start + t['keys_offset'])
+            dtype = np.dtype(t['counts_dtype']).newbyteorder('<')
+            counts = np.frombuffer(buf, dtype=dtype, count=t['size'],
+                                   offset=start + t['counts_offset'])
+            tables[t['length']] = (keys, counts)
+        vocab = Vocabulary(header.pop('vocab'))
+
+        return cls(vocab, tables, header.pop('bits')), header
+
+    def __len__(self):
+        return sum(len(keys) for keys, _ in self.tables.values())
+
+    def __getitem__(self, tokens):
+        table = self.tables.get(len(tokens))
+        ids = self.vocab.lookup(tokens)
+        if table is None or ids is None:
+            return 0
+        keys, counts = table
+        key = np.uint64(self.pack(ids))
+        i = keys.searchsorted(key)
+        if i < len(keys) and keys[i] == key:
+            return int(counts[i])
+        return 0
+
+    def count_array(self, ids):
+        """Counts of the rows of a 2-D array of token ids, all of the same
+        length. Rows with unseen tokens (negative ids) count 0.
+
+        ids -- array of shape (number of n-grams, n).
+        """
+        result = np.zeros(len(ids), dtype=np.int64)
+        table = self.tables.get(ids.shape[1])
+        if table is None or not len(ids) or not len(table[0]):
+            return result
+        keys, counts = table
+        known = (ids >= 0).all(axis=1)
+        query = self.pack_array(ids[known])
+        # searching sorted queries walks the table in order, much faster
+        order = np.argsort(query)
+        i = np.empty(len(query), dtype=np.intp)
+        i[order] = keys.searchsorted(query[order]).clip(max=len(keys) - 1)
+        found = keys[i] == query
+        result[known] = np.where(found, counts[i], 0)
+        return result
+
+    def update(self, id_counts):
+        """Add counts to the tables, repacking the keys if the vocabulary
+        grew past the bits per id.
+
+        id_counts -- dict from tuples of token ids to counts.
+        """
+        bits = max(len(self.vocab) - 1, 1).bit_length()
+        if bits > self.bits:
+            self.repack(bits)
+
+        by_length = {}
+        for ids, c in id_counts.items():
+            by_length.setdefault(len(ids), []).append((ids, c))
+
+        for length, entries in by_length.items():
+            ids = np.array([e[0] for e in entries], dtype=np.uint64)
+            keys = self.pack_array(ids.reshape(len(entries), length))
+            counts = np.array([e[1] for e in entries], dtype=np.int64)
+            if length in self.tables:
+                old_keys, old_counts = self.tables[length]
+                keys = np.concatenate([old_keys, keys])
+                counts = np.concatenate([old_counts.astype(np.int64), counts])
+            keys, index = np.unique(keys, return_inverse=True)
+            summed = np.zeros(len(keys), dtype=np.int64)
+            np.add.at(summed, index, counts)
+            self.tables[length] = (keys, counts_array(summed))
+
+    def repack(self, bits):
+        """Pack the keys again with more bits per id. Packing keeps the
+        order of the keys, so the tables stay sorted.
+
+        bits -- the new bits per id.
+        """
+        tables = {}
+        for length, (keys, counts) in self.tables.items():
+            ids = self.unpack_array(keys, length)
+            tables[length] = (ids, counts)
+        self.bits = bits
+        for length, (ids, counts) in tables.items():
+            self.tables[length] = (self.pack_array(ids), counts)
+
+    def prune(self, length, cutoff, subtract=True):
+        """Drop the n-grams of one length seen less than cutoff times.
+
+        length -- the n-gram length.
+        cutoff -- minimum count of the kept n-grams.
+        subtract -- also subtract their counts from their (n-1)-gram
+            prefixes, dropping the prefixes that reach 0.
+        """
+        keys, counts = self.tables[length]
+        drop = counts < cutoff
+        if not drop.any():
+            return
+        self.tables[length] = (keys[~drop], counts[~drop])
+        if not subtract:
+            return
+
+        # the prefix of a packed key is the key without its last id
+        prefixes = keys[drop] >> np.uint64(self.bits)
+        prefix_keys, prefix_counts = self.tables[length - 1]
+        prefix_counts = prefix_counts.astype(np.int64)
+        np.subtract.at(prefix_counts, prefix_keys.searchsorted(prefixes),
+                       counts[drop].astype(np.int64))
+        keep = prefix_counts > 0
+        self.tables[length - 1] = (prefix_keys[keep],
+                                   counts_array(prefix_counts[keep]))
+
+    def add_table(self, ids, counts, dtype=None):
+        """Pack, sort and store the table for n-grams of one length.
+
+        ids -- array of token ids of shape (number of n-grams, n).
+        counts -- array of counts.
+        dtype -- type of the stored counts (default: 32 bits, or 64 if
+            needed).
+        """
+        keys = self.pack_array(ids)
+        order = np.argsort(keys, kind='stable')
+        counts = counts[order]
+        if dtype is None:
+            counts = counts_array(counts)
+        else:
+            counts = counts.astype(dtype)
+        self.tables[ids.shape[1]] = (keys[order], counts)
+
+    def continuations(self, context):
+        """Return a dict with the tokens seen after a context and the counts
+        of the n-grams they form with it. The keys starting with the context
+        are contiguous, so this is two binary searches and a slice.
+
+        context -- tuple of tokens.
+        """
+        table = self.tables.get(len(context) + 1)
+        ids = self.vocab.lookup(context)
+        if table is None or ids is None:
+            return {}
+        keys, counts = table
+        bits = self.bits
+        start = self.pack(ids) << bits
+        lo = keys.searchsorted(np.uint64(start))
+        end = start + (1 << bits)
+        hi = keys.searchsorted(np.uint64(end)) if end < 2 ** 64 else len(keys)
+        last = keys[lo:hi] & np.uint64((1 << bits) - 1)
+        tokens = self.vocab.tokens
+        return {tokens[i]: c
+                for i, c in zip(last.tolist(), counts[lo:hi].tolist())}
+
+    def get(self, tokens, default=0):
+        """Count of an n-gram, or default if it is unseen.
+
+        tokens -- the n-gram, a tuple of tokens.
+        default -- value returned for unseen n-grams.
+        """
+        return self[tokens] or default
+
+    def id_items(self, length):
+        """Iterate over the (ids, count) pairs of the n-grams of one length,
+        ids being tuples of token ids.
+
+        length -- the n-gram length.
+        """
+        table = self.tables.get(length)
+        if table is None:
+            return
+        keys, counts = table
+        block_size = 2 ** 16
+        for i in range(0, len(keys), block_size):
+            ids = self.unpack_array(keys[i: i + block_size], length)
+            yield from zip(map(tuple, ids.tolist()),
+                           counts[i: i + block_size].tolist())
+
+    def pack(self, ids):
+        """Pack a tuple of token ids into an integer key.
+
+        ids -- the token ids.
+        """
+        bits = self.bits
+        key = 0
+        for i in ids:
+            key = (key << bits) | i
+        return key
+
+    def pack_array(self, ids):
+        """Pack the rows of a 2-D array of token ids into integer keys.
+
+        ids -- array of shape (number of n-grams, n).
+        """
+        bits = self.bits
+        length = ids.shape[1]
+        if length * bits > 64:
+            raise ValueError('{}-grams over a vocabulary of {} tokens do not '
+                             'fit in 64 bits'.format(length, len(self.vocab)))
+        keys = np.zeros(len(ids), dtype=np.uint64)
+        for j in range(length):
+            keys <<= np.uint64(bits)
+            keys |= ids[:, j].astype(np.uint64)
+        return keys
+
+    def unpack_array(self, keys, length):
+        """Unpack integer keys into a 2-D array of token ids.
+
+        keys -- array of packed keys.
+        length -- length of the n-grams.
+        """
+        bits = np.uint64(self.bits)
+        mask = np.uint64((1 << self.bits) - 1)
+        ids = np.empty((len(keys), length), dtype=np.uint64)
+        keys = keys.copy()
+        for j in reversed(range(length)):
+            ids[:, j] = keys & mask
+            keys >>= bits
+        return ids
+
+    def items(self):
+        """Iterate over the (n-gram, count) pairs, n-grams being token tuples.
+        """
+        tokens = self.vocab.tokens
+        for length, (keys, counts) in sorted(self.tables.items()):
+            ids = self.unpack_array(keys, length)
+            for row, c in zip(ids.tolist(), counts.tolist()):
+                yield tuple(tokens[i] for i in row), c
+
+
+class CountChunks(object):
+    """Partial count tables flushed to disk as sorted chunks, so that counting
+    a corpus takes bounded memory. PackedCounts.from_chunks() merges them.
+    """
+
+    def __init__(self, directory, block_size=2 ** 16):
+        """
+        directory -- directory where the chunks are written.
+        block_size -- rows read at a time from each chunk while merging.
+        """
+        self.directory = directory
+        self.block_size = block_size
+        self.chunks = []
+
+    def flush(self, id_counts):
+        """Write a partial count table as a new chunk.
+
+        id_counts -- dict from tuples of token ids to counts.
+        """
+        by_length = {}
+        for ids, c in id_counts.items():
+            by_length.setdefault(len(ids), []).append((ids, c))
+
+        chunk = {}
+        for length, entries in by_length.items():
+            entries.sort()
+            ids = np.array([e[0] for e in entries], dtype=np.uint32)
+            ids = ids.reshape(len(entries), length)
+            counts = np.array([e[1] for e in entries], dtype=np.uint64)
+            prefix = os.path.join(self.directory, '{}-{}'.format(
+                len(self.chunks), length))
+            np.save(prefix + '-ids.npy', ids)
+            np.save(prefix + '-counts.npy', counts)
+            chunk[length] = prefix
+        self.chunks.append(chunk)
+
+    def lengths(self):
+        """Return the n-gram lengths present in some chunk."""
+        return sorted(set().union(*self.chunks))
+
+    def rows(self, prefix):
+        """Iterate over the (ids, count) pairs of a chunk table in order,
+        reading it a block at a time.
+
+        prefix -- path prefix of the table files.
+        """
+        ids = np.load(prefix + '-ids.npy', mmap_mode='r')
+        counts = np.load(prefix + '-counts.npy', mmap_mode='r')
+        block_size = self.block_size
+        for i in range(0, len(ids), block_size):
+            rows = map(tuple, ids[i: i + block_size].tolist())
+            yield from zip(rows, counts[i: i + block_size].tolist())
+
+    def merged(self, length):
+        """Iterate in order over the (ids, count) pairs of all the chunks for
+        n-grams of one length, adding the counts of repeated n-grams.
+
+        length -- the n-gram length.
+        """
+        tables = [self.rows(chunk[length])
+                  for chunk in self.chunks if length in chunk]
+        merged = heapq.merge(*tables, key=itemgetter(0))
+        for ids, group in groupby(merged, key=itemgetter(0)):
+            yield ids, sum(c for _, c in group)
+
+
+def ngram_windows(ids, lengths, n):
+    """Gather the n-grams of a batch of encoded sentences. Returns a pair
+    (array of shape (number of n-grams, n), sentence index of each n-gram).
+
+    ids -- array with the ids of all the sentences, one after the other.
+    lengths -- array with the length of each sentence.
+    n -- order of the n-grams.
+    """
+    offsets = np.cumsum(lengths) - lengths
+    sizes = np.maximum(lengths - n + 1, 0)
+    index = np.repeat(np.arange(len(lengths)), sizes)
+    firsts = np.cumsum(sizes) - sizes
+    starts = offsets[index] + np.arange(len(index)) - firsts[index]
+    return ids[starts[:, np.newaxis] + np.arange(n)], index
+
+
+def quantize(values, bits):
+    """Quantize values into codes 1, ..., 2 ** bits - 1, binning them by
+    rank so every code is used about as often. Returns a pair (codes,
+    codebook), codebook[code] being the mean of the values with that code.
+    Code 0 is left free.
+
+    values -- array of finite values.
+    bits -- bits per code, 8 or 16.
+    """
+    levels = 2 ** bits - 1
+    size = len(values)
+    codes = np.empty(size, dtype=np.uint32)
+    ranks = np.arange(size, dtype=np.int64) * levels // max(size, 1)
+    codes[np.argsort(values, kind='stable')] = ranks + 1
+    sums = np.bincount(codes, weights=values, minlength=levels + 1)
+    sizes = np.bincount(codes, minlength=levels + 1)
+    codebook = sums / np.maximum(sizes, 1)
+    return codes, codebook
+
+
+def counts_array(counts):
+    """Store counts in 32 bits unless some count needs more.
+
+    counts -- array of counts.
+    """
+    if len(counts) and counts.max() >= 2 ** 32:
+        return counts.astype(np.uint64)
+    return counts.astype(np.uint32)
+
+
+def aligned(nbytes):
+    """Round a number of bytes up to a multiple of 8.
+
+    nbytes -- the number of bytes.
+    """
+    return (nbytes + 7) // 8 * 8
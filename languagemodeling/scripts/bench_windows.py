@@ -0,0 +1,98 @@
+"""Compare slicing each n-gram out of a padded copy of the sentence with
+the sliding windows used by the models, on the Gutenberg corpus. Slicing
+allocates a list and a tuple per n-gram and a padded list per sentence;
+the windows allocate only the n-gram tuple.
+
+Usage:
+  bench_windows.py [-n <n>] [-r <repeat>]
+  bench_windows.py -h | --help
+
+Options:
+  -n <n>        Order of the n-grams [default: 3].
+  -r <repeat>   Passes over the corpus, keeping the best time [default: 3].
+  -h --help     Show this screen.
+"""
+from docopt import docopt
+import time
+# https://docs.python.org/3/library/tracemalloc.html
+import tracemalloc
+
+from nltk.corpus import gutenberg
+
+from languagemodeling.ngram import pad, padded, windows
+
+
+def sliced(sents, n):
+    """Iterate over the n-grams of padded sentences slicing copies."""
+    for sent in sents:
+        sent = pad(sent, n)
+        for i in range(len(sent) - n + 1):
+            yield tuple(sent[i: i + n])
+
+
+def windowed(sents, n):
+    """Iterate over the n-grams of padded sentences with windows()."""
+    for sent in sents:
+        yield from windows(padded(sent, n), n)
+
+
+def consume(ngrams):
+    """Iterate over the n-grams, holding only the last one."""
+    m = 0
+    for ngram in ngrams:
+        m += 1
+    return m
+
+
+def allocated(ngrams):
+    """Bytes allocated to produce each n-gram, as the traced memory peak
+    above the memory in use before asking for it, summed over the n-grams.
+    The temporaries of one n-gram are alive at the same time, so this counts
+    every one of them; the peak of a whole pass would count them just once.
+    Objects reused from CPython's free lists do not allocate and do not
+    count.
+    """
+    total = 0
+    tracemalloc.start()
+    while True:
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        ngram = next(ngrams, None)
+        if ngram is None:
+            break
+        total += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    return total
+
+
+def measure(f, sents, n, repeat):
+    """Best time of some passes over the n-grams, number of n-grams and
+    bytes allocated in one traced pass.
+    """
+    best = float('inf')
+    for i in range(repeat):
+        start = time.perf_counter()
+        m = consume(f(sents, n))
+        best = min(best, time.perf_counter() - start)
+
+    return best, m, allocated(f(sents, n))
+
+
+if __name__ == '__main__':
+    opts = docopt(__doc__)
+    n = int(opts['-n'])
+    repeat = int(opts['-r'])
+
+    sents = list(gutenberg.sents('austen-emma.txt'))
+
+    results = {}
+    for name, f in [('sliced', sliced), ('windows', windowed)]:
+        results[name] = best, m, size = measure(f, sents, n, repeat)
+        print('{}: {} {}-grams in {:.3f}s ({:.0f} n-grams/s), '
+              'allocated {:.1f} MiB ({:.0f} bytes/n-gram)'.format(
+                  name, m, n, best, m / best, size / 2 ** 20, size / m))
+
+    sliced_best, windows_best = results['sliced'][0], results['windows'][0]
+    sliced_size, windows_size = results['sliced'][2], results['windows'][2]
+    print('Speedup: {:.2f}x'.format(sliced_best / windows_best))
+    print('Allocated: {:.2f}x less'.format(sliced_size / windows_size))
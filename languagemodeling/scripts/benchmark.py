@@ -0,0 +1,155 @@
+"""Benchmark training and scoring of the language models on a synthetic
+corpus, saving the results as JSON to compare them between commits.
+
+Usage:
+  benchmark.py [-s <sents>] [-l <length>] [-v <vocab>] [-r <repeat>]
+               [-c <file>] [-o <file>]
+  benchmark.py -h | --help
+
+Options:
+  -s <sents>    Sentences of the synthetic corpus [default: 5000].
+  -l <length>   Mean sentence length [default: 20].
+  -v <vocab>    Vocabulary size [default: 5000].
+  -r <repeat>   Runs per benchmark, keeping the best time [default: 3].
+  -c <file>     Results of a previous run to compare with.
+  -o <file>     Save the results to this JSON file.
+  -h --help     Show this screen.
+"""
+from docopt import docopt
+# https://docs.python.org/3/library/json.html
+import json
+from itertools import islice
+import random
+import subprocess
+import time
+
+from languagemodeling.ngram import NGram, KneserNeyNGram, padded, windows
+
+
+models = {
+    'ngram': NGram,
+    'kn': KneserNeyNGram,
+}
+
+# number of prob() calls timed for the latency benchmarks
+PROB_CALLS = 10000
+
+
+def synthetic_corpus(size, length, vocab, seed=0):
+    """Sentences with Zipf-distributed tokens and geometric lengths, so the
+    counts look like those of a natural language corpus.
+
+    size -- number of sentences.
+    length -- mean sentence length.
+    vocab -- vocabulary size.
+    seed -- random seed.
+    """
+    rng = random.Random(seed)
+    tokens = ['w{}'.format(i) for i in range(vocab)]
+    weights = [1.0 / (i + 1) for i in range(vocab)]
+    sents = []
+    for i in range(size):
+        m = 1
+        while rng.random() > 1.0 / length:
+            m += 1
+        sents.append(rng.choices(tokens, weights, k=m))
+    return sents
+
+
+def best_time(f, repeat):
+    """Best wall-clock time of some calls to a function, and its result."""
+    best = float('inf')
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = f()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def benchmarks(train, test, repeat):
+    """Run the benchmarks, yielding (name, time, unit, rate) tuples, rate
+    being the units processed per second.
+
+    train -- training sentences.
+    test -- held-out sentences.
+    repeat -- runs per benchmark.
+    """
+    train_tokens = sum(len(sent) for sent in train)
+    test_tokens = sum(len(sent) for sent in test)
+
+    for name, model_class in sorted(models.items()):
+        for packed in [False, True]:
+            storage = 'packed' if packed else 'dict'
+            for n in range(1, 5):
+                prefix = '{}/{}/n={}'.format(name, storage, n)
+
+                t, model = best_time(
+                    lambda: model_class(n, train, packed=packed), repeat)
+                yield prefix + '/train', t, 'tokens', train_tokens / t
+
+                # prob() latency over the n-grams of the held-out data (of
+                # the training data for the unsmoothed model, which has no
+                # probabilities for unseen contexts)
+                if model_class is NGram:
+                    ngrams = (g for sent in train for g in windows(sent, n))
+                else:
+                    ngrams = (g for sent in test
+                              for g in windows(padded(sent, n), n))
+                queries = [(g[-1], list(g[:-1]))
+                           for g in islice(ngrams, PROB_CALLS)]
+                prob = model.prob
+
+                def probs():
+                    for token, prev_tokens in queries:
+                        prob(token, prev_tokens)
+                t, _ = best_time(probs, repeat)
+                yield prefix + '/prob', t, 'calls', len(queries) / t
+
+                t, _ = best_time(lambda: model.sents_log_prob(test), repeat)
+                yield prefix + '/sents_log_prob', t, 'tokens', test_tokens / t
+
+
+def revision():
+    """Current git commit, if any."""
+    try:
+        out = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                      stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.decode().strip()
+
+
+if __name__ == '__main__':
+    opts = docopt(__doc__)
+    size = int(opts['-s'])
+    length = int(opts['-l'])
+    vocab = int(opts['-v'])
+    repeat = int(opts['-r'])
+
+    # 90% for training, 10% held out
+    sents = synthetic_corpus(size, length, vocab)
+    split = size * 9 // 10
+    train, test = sents[:split], sents[split:]
+
+    baseline = {}
+    if opts['-c']:
+        with open(opts['-c']) as f:
+            baseline = {r['name']: r for r in json.load(f)['results']}
+
+    results = []
+    for name, t, unit, rate in benchmarks(train, test, repeat):
+        results.append({'name': name, 'time': t, 'unit': unit, 'rate': rate})
+        line = '{:32} {:10.4f}s {:12.0f} {}/s'.format(name, t, rate, unit)
+        if name in baseline:
+            line += ' ({:.2f}x)'.format(rate / baseline[name]['rate'])
+        print(line)
+
+    if opts['-o']:
+        report = {
+            'revision': revision(),
+            'corpus': {'sents': size, 'length': length, 'vocab': vocab},
+            'repeat': repeat,
+            'results': results,
+        }
+        with open(opts['-o'], 'w') as f:
+            json.dump(report, f, indent=2)
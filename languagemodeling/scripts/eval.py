@@ -0,0 +1,112 @@
+"""Evaluate a language model using a test set.
+
+Usage:
+  eval.py -i <file> [-m <model>] [-j <workers>] [-s <size>]
+  eval.py -h | --help
+
+Options:
+  -i <file>     Language model file, pickled or saved with NGram.save().
+  -m <model>    Model class of a file saved with NGram.save()
+                [default: ngram]:
+                  ngram: Unsmoothed n-grams.
+                  kn: N-grams with modified Kneser-Ney smoothing.
+                  quantized: Quantized model (saved with train.py -q).
+  -j <workers>  Score in parallel with this many processes.
+  -s <size>     Sentences scored per batch [default: 1000].
+  -h --help     Show this screen.
+"""
+from docopt import docopt
+from multiprocessing import Pool
+import sys
+import time
+
+from nltk.corpus import gutenberg
+
+from corpus.util import iter_chunks
+from languagemodeling.ngram import NGram, KneserNeyNGram, QuantizedNGram
+from languagemodeling.ngram import load_model
+
+
+models = {
+    'ngram': NGram,
+    'kn': KneserNeyNGram,
+    'quantized': QuantizedNGram,
+}
+
+
+def progress(msg, width=None):
+    """Ouput the progress of something on the same line."""
+    if not width:
+        width = len(msg)
+    print('\b' * width + msg, end='')
+    sys.stdout.flush()
+
+
+def load(filename, model_class):
+    """Load the global model, in the main process and in each worker.
+
+    filename -- the model file.
+    model_class -- class of the model if it was saved with NGram.save().
+    """
+    global model
+    model = load_model(filename, model_class)
+
+
+def score(sents):
+    """Score a batch of sentences with the global model. Returns the
+    log-probability, the number of scored tokens and of sentences.
+
+    sents -- list of sentences.
+    """
+    log_prob = sum(model.sents_log_prob(sents))
+    m = sum(model.scored_tokens(sent) for sent in sents)
+    return log_prob, m, len(sents)
+
+
+def add_up(results, start):
+    """Add up the scores of the batches, showing the progress. Returns the
+    log-probability and the number of scored tokens.
+
+    results -- iterable of the results of score().
+    start -- time the scoring started.
+    """
+    log_prob, m, total = 0.0, 0, 0
+    for batch_log_prob, batch_m, batch_total in results:
+        log_prob += batch_log_prob
+        m += batch_m
+        total += batch_total
+        elapsed = time.time() - start
+
+        progress('{} sents ({:.0f} sents/s, {:.0f} tokens/s)'.format(
+            total, total / elapsed, m / elapsed))
+    return log_prob, m
+
+
+if __name__ == '__main__':
+    opts = docopt(__doc__)
+
+    # load the model (each worker loads it too; binary files are
+    # memory-mapped, so the workers share their pages)
+    args = opts['-i'], models[opts['-m']]
+    load(*args)
+
+    # load the data
+    sents = gutenberg.sents('austen-persuasion.txt')
+    batches = iter_chunks(sents, int(opts['-s']))
+
+    # score
+    start = time.time()
+    workers = opts['-j'] and int(opts['-j'])
+    if workers and workers > 1:
+        with Pool(workers, initializer=load, initargs=args) as pool:
+            log_prob, m = add_up(pool.imap(score, batches), start)
+    else:
+        log_prob, m = add_up(map(score, batches), start)
+
+    cross_entropy = -log_prob / m
+    perplexity = 2 ** cross_entropy
+
+    print('')
+    print('Log-probability: {}'.format(log_prob))
+    print('Cross-entropy: {}'.format(cross_entropy))
+    print('Perplexity: {}'.format(perplexity))
@@ -0,0 +1,84 @@
+"""Prune an n-gram model, reporting its size and perplexity change.
+
+Usage:
+  prune.py -i <file> [-m <model>] -c <cutoffs> [-b] -o <file>
+  prune.py -h | --help
+
+Options:
+  -i <file>     Language model file, pickled or saved with NGram.save().
+  -m <model>    Model class of a file saved with NGram.save()
+                [default: ngram]:
+                  ngram: Unsmoothed n-grams.
+                  kn: N-grams with modified Kneser-Ney smoothing.
+  -c <cutoffs>  Comma-separated minimum counts for orders 1, ..., n.
+  -b --binary   Save in the binary format that NGram.load() memory-maps.
+  -o <file>     Output model file.
+  -h --help     Show this screen.
+"""
+from docopt import docopt
+from math import isinf
+import pickle
+
+from nltk.corpus import gutenberg
+
+from languagemodeling.ngram import NGram, KneserNeyNGram, load_model
+
+
+models = {
+    'ngram': NGram,
+    'kn': KneserNeyNGram,
+}
+
+
+def size(model):
+    """Number of entries in the count tables of a model.
+
+    model -- the model.
+    """
+    return len(model.counts) + len(getattr(model, 'cont', ()))
+
+
+def perplexity(model, sents):
+    """Perplexity of a model on a list of sentences.
+
+    model -- the model.
+    sents -- the sentences.
+    """
+    log_prob = sum(model.sents_log_prob(sents))
+    m = sum(model.scored_tokens(sent) for sent in sents)
+    return 2 ** (-log_prob / m)
+
+
+if __name__ == '__main__':
+    opts = docopt(__doc__)
+
+    # load the model
+    model = load_model(opts['-i'], models[opts['-m']])
+
+    # load the data
+    sents = list(gutenberg.sents('austen-persuasion.txt'))
+
+    # prune
+    cutoffs = [int(c) for c in opts['-c'].split(',')]
+    before = size(model), perplexity(model, sents)
+    model.prune(cutoffs)
+    after = size(model), perplexity(model, sents)
+
+    print('Entries: {} -> {} ({:.1f}%)'.format(
+        before[0], after[0], after[0] * 100.0 / before[0]))
+    if isinf(before[1]) or isinf(after[1]):
+        # the unsmoothed model gives probability 0 to unseen n-grams
+        print('Perplexity: {} -> {} (the model has unseen n-grams of the '
+              'test data; use a smoothed model to compare)'.format(
+                  before[1], after[1]))
+    else:
+        print('Perplexity: {} -> {}'.format(before[1], after[1]))
+
+    # save it
+    filename = opts['-o']
+    if opts['--binary']:
+        model.save(filename)
+    else:
+        f = open(filename, 'wb')
+        pickle.dump(model, f)
+        f.close()
@@ -0,0 +1,176 @@
+"""Serve a language model over HTTP, loading it once for all the clients.
+
+Usage:
+  serve.py -i <file> [-m <model>] [-p <port> | -u <path>]
+  serve.py -h | --help
+
+Options:
+  -i <file>     Language model file, pickled or saved with NGram.save().
+  -m <model>    Model class of a file saved with NGram.save()
+                [default: ngram]:
+                  ngram: Unsmoothed n-grams.
+                  kn: N-grams with modified Kneser-Ney smoothing.
+                  quantized: Quantized model (saved with train.py -q).
+  -p <port>     Listen on this port of localhost [default: 8000].
+  -u <path>     Listen on this Unix socket instead.
+  -h --help     Show this screen.
+
+Requests are POSTs with a JSON body, answered with JSON. Each one is a
+batch, so clients should send many queries per request:
+  /prob            {"queries": [[token, [prev_token, ...]], ...]}
+                   -> {"probs": [p, ...]}
+  /sents_log_prob  {"sents": [[token, ...], ...]}
+                   -> {"log_probs": [log_prob, ...]}
+Log-probabilities of sentences with unseen n-grams are -Infinity. Queries
+with unseen contexts for an unsmoothed model are answered with a 400 error.
+"""
+from docopt import docopt
+# https://docs.python.org/3/library/http.server.html
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+from socketserver import ThreadingMixIn, UnixStreamServer
+from threading import Lock
+
+from languagemodeling.ngram import NGram, KneserNeyNGram, QuantizedNGram
+from languagemodeling.ngram import load_model
+
+
+models = {
+    'ngram': NGram,
+    'kn': KneserNeyNGram,
+    'quantized': QuantizedNGram,
+}
+
+
+def is_sent(value):
+    """Check if a decoded value is a list of tokens."""
+    return isinstance(value, list) and all(isinstance(t, str) for t in value)
+
+
+def field(request, name):
+    """Return a list field of a request, raising ValueError if it is
+    missing.
+
+    request -- the decoded request.
+    name -- the field name.
+    """
+    if not isinstance(request, dict) or \
+            not isinstance(request.get(name), list):
+        raise ValueError('expected an object with a list "{}"'.format(name))
+    return request[name]
+
+
+def prob(model, request):
+    """Conditional probabilities of a batch of (token, prev_tokens) pairs.
+
+    model -- the model.
+    request -- the decoded request.
+    """
+    queries = field(request, 'queries')
+    for query in queries:
+        if not (isinstance(query, list) and len(query) == 2 and
+                isinstance(query[0], str) and is_sent(query[1]) and
+                len(query[1]) == model.n - 1):
+            raise ValueError('expected [token, [{} previous tokens]], got '
+                             '{}'.format(model.n - 1, json.dumps(query)))
+    prob = model.prob
+    probs = [prob(token, prev_tokens) for token, prev_tokens in queries]
+    return {'probs': probs}
+
+
+def sents_log_prob(model, request):
+    """Log-probabilities (base 2) of a batch of sentences.
+
+    model -- the model.
+    request -- the decoded request.
+    """
+    sents = field(request, 'sents')
+    for sent in sents:
+        if not is_sent(sent):
+            raise ValueError('expected a list of tokens, got {}'.format(
+                json.dumps(sent)))
+    return {'log_probs': list(model.sents_log_prob(sents))}
+
+
+methods = {
+    '/prob': prob,
+    '/sents_log_prob': sents_log_prob,
+}
+
+
+class ModelHandler(BaseHTTPRequestHandler):
+    """Answer the requests with the model of the server. Each request runs
+    in its own thread; the ones using the model are serialized if it has a
+    prob() cache, which is not thread-safe.
+    """
+
+    def do_POST(self):
+        method = methods.get(self.path)
+        if method is None:
+            self.send_error(404, 'Unknown method {}'.format(self.path))
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length).decode('utf-8'))
+        except ValueError as e:
+            self.send_error(400, 'Invalid request: {}'.format(e))
+            return
+
+        server = self.server
+        try:
+            if server.lock is not None:
+                with server.lock:
+                    response = method(server.model, request)
+            else:
+                response = method(server.model, request)
+        except ValueError as e:
+            self.send_error(400, 'Invalid request: {}'.format(e))
+            return
+        except ZeroDivisionError:
+            # the unsmoothed model has no distribution for unseen contexts
+            self.send_error(400, 'Unseen context')
+            return
+
+        body = json.dumps(response).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return self.client_address[0] if self.client_address else 'unix'
+
+
+class ThreadingUnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+if __name__ == '__main__':
+    opts = docopt(__doc__)
+
+    # load the model
+    model = load_model(opts['-i'], models[opts['-m']])
+
+    if opts['-u']:
+        path = opts['-u']
+        if os.path.exists(path):
+            os.remove(path)
+        server = ThreadingUnixHTTPServer(path, ModelHandler)
+        print('Serving on {}'.format(path))
+    else:
+        server = ThreadingHTTPServer(('localhost', int(opts['-p'])),
+                                     ModelHandler)
+        print('Serving on http://localhost:{}'.format(server.server_port))
+
+    server.model = model
+    server.lock = Lock() if getattr(model, 'cache', None) is not None else None
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -1,11 +1,23 @@
 """Train an n-gram model.
 
 Usage:
-  train.py -n <n> -o <file>
+  train.py -n <n> [-m <model>] [-p] [-c <size>] [-j <workers>]
+           [-b | -q <bits>] -o <file>
   train.py -h | --help
 
 Options:
   -n <n>        Order of the model.
+  -m <model>    Model to use [default: ngram]:
+                  ngram: Unsmoothed n-grams.
+                  kn: N-grams with modified Kneser-Ney smoothing.
+  -p --packed   Store counts in integer-encoded, array-backed tables.
+  -c <size>     Count in chunks of <size> sentences flushed to disk, with
+                bounded memory (implies -p).
+  -j <workers>  Count in parallel with this many processes.
+  -b --binary   Save in the binary format that NGram.load() memory-maps.
+  -q <bits>     Save in back-off form with 8 or 16-bit quantized
+                log-probabilities, in the binary format that
+                QuantizedNGram.load() memory-maps.
   -o <file>     Output model file.
   -h --help     Show this screen.
 """
@@ -14,7 +26,13 @@ import pickle
 
 from nltk.corpus import gutenberg
 
-from languagemodeling.ngram import NGram
+from languagemodeling.ngram import NGram, KneserNeyNGram, QuantizedNGram
+
+
+models = {
+    'ngram': NGram,
+    'kn': KneserNeyNGram,
+}
 
 
 if __name__ == '__main__':
@@ -25,10 +43,19 @@ if __name__ == '__main__':
 
     # train the model
     n = int(opts['-n'])
-    model = NGram(n, sents)
+    chunk_size = opts['-c'] and int(opts['-c'])
+    workers = opts['-j'] and int(opts['-j'])
+    model_class = models[opts['-m']]
+    model = model_class(n, sents, packed=opts['--packed'],
+                        chunk_size=chunk_size, workers=workers)
 
     # save it
     filename = opts['-o']
-    f = open(filename, 'wb')
-    pickle.dump(model, f)
-    f.close()
+    if opts['-q']:
+        QuantizedNGram(model, int(opts['-q'])).save(filename)
+    elif opts['--binary']:
+        model.save(filename)
+    else:
+        f = open(filename, 'wb')
+        pickle.dump(model, f)
+        f.close()
@@ -0,0 +1,73 @@
+# https://docs.python.org/3/library/unittest.html
+from unittest import TestCase
+
+from languagemodeling.cache import LRUCache
+from languagemodeling.ngram import NGram
+
+
+class TestLRUCache(TestCase):
+
+    def test_eviction(self):
+        cache = LRUCache(2)
+        cache['a'] = 1
+        cache['b'] = 2
+        self.assertEqual(cache.get('a'), 1)  # 'b' is now the oldest
+
+        cache['c'] = 3
+        self.assertEqual(len(cache), 2)
+        self.assertTrue('a' in cache)
+        self.assertFalse('b' in cache)
+        self.assertTrue('c' in cache)
+
+    def test_info(self):
+        cache = LRUCache(10)
+        self.assertEqual(cache.get('a'), None)
+        cache['a'] = 1
+        cache.get('a')
+        cache.get('a')
+
+        self.assertEqual(cache.info(), (2, 1, 10, 1))
+
+        cache.clear()
+        self.assertEqual(cache.info(), (0, 0, 10, 0))
+
+
+class TestNGramCache(TestCase):
+
+    def setUp(self):
+        self.sents = [
+            'el gato come pescado .'.split(),
+            'la gata come salmón .'.split(),
+        ]
+
+    def test_prob(self):
+        for packed in [False, True]:
+            ngram = NGram(2, self.sents, packed=packed, cache_size=2)
+
+            for i in range(3):
+                self.assertEqual(ngram.prob('pescado', ['come']), 0.5)
+                self.assertEqual(ngram.prob('salame', ['come']), 0.0)
+            info = ngram.cache_info()
+            self.assertEqual((info.hits, info.misses), (4, 2))
+
+            # evicts ('pescado', ('come',))
+            self.assertEqual(ngram.prob('gato', ['el']), 1.0)
+            self.assertEqual(ngram.prob('pescado', ['come']), 0.5)
+            self.assertEqual(ngram.cache_info().misses, 4)
+
+    def test_no_cache(self):
+        ngram = NGram(2, self.sents)
+
+        self.assertEqual(ngram.prob('pescado', ['come']), 0.5)
+        self.assertEqual(ngram.cache_info(), None)
+
+    def test_update(self):
+        ngram = NGram(2, self.sents, cache_size=10)
+        ngram.prob('pescado', ['come'])
+        ngram.prob('gato', ['el'])
+
+        ngram.update(['el perro ladra .'.split()])
+
+        self.assertFalse(('gato', ('el',)) in ngram.cache)
+        self.assertTrue(('pescado', ('come',)) in ngram.cache)
+        self.assertEqual(ngram.prob('gato', ['el']), 0.5)
@@ -0,0 +1,219 @@
+# https://docs.python.org/3/library/unittest.html
+from unittest import TestCase
+from math import log2
+import os
+import pickle
+from tempfile import TemporaryDirectory
+
+from languagemodeling.ngram import KneserNeyNGram
+
+
+class TestKneserNeyNGram(TestCase):
+
+    def setUp(self):
+        self.sents = [
+            'el gato come pescado .'.split(),
+            'la gata come salmón .'.split(),
+        ]
+
+    def test_count_continuations_2gram(self):
+        model = KneserNeyNGram(2, self.sents)
+
+        # number of distinct tokens before each token
+        cont = {
+            ('el',): 1,
+            ('gato',): 1,
+            ('come',): 2,
+            ('pescado',): 1,
+            ('.',): 2,
+            ('</s>',): 1,
+            ('la',): 1,
+            ('gata',): 1,
+            ('salmón',): 1,
+        }
+        self.assertEqual(dict(model.cont), cont)
+        self.assertEqual(model.totals[()], 11)
+        self.assertEqual(model.V(), 9)
+
+    def test_count_continuations_3gram(self):
+        model = KneserNeyNGram(3, self.sents)
+
+        self.assertEqual(model.cont[('come', 'pescado')], 1)
+        self.assertEqual(model.cont[('.', '</s>')], 2)
+        self.assertEqual(model.cont[('<s>', 'el')], 1)
+        self.assertEqual(model.cont[('come',)], 2)
+        self.assertEqual(model.cont[('.',)], 2)
+        self.assertEqual(model.totals[('come',)], 2)
+
+    def test_cond_prob_2gram(self):
+        model = KneserNeyNGram(2, self.sents)
+
+        d = model.discounts[2][0]  # all bigram counts are 1 or 2
+        d1 = model.discounts[1][0]  # all continuation counts are 1 or 2
+        uniform = 1 / 9.0
+        gamma1 = (7 * d1 + 2 * model.discounts[1][1]) / 11.0
+        p1 = (1 - d1) / 11.0 + gamma1 * uniform  # 'pescado'
+
+        p = (1 - d) / 2.0 + 2 * d / 2.0 * p1
+        self.assertAlmostEqual(model.prob('pescado', ['come']), p)
+
+    def test_norm(self):
+        tokens = ['el', 'gato', 'come', 'pescado', '.', 'la', 'gata',
+                  'salmón', '</s>']
+        prev_tokens = tokens[:-1] + ['<s>', 'salame']
+
+        for packed in [False, True]:
+            for n in range(1, 4):
+                model = KneserNeyNGram(n, self.sents, packed=packed)
+                prevs = [[]] if n == 1 else \
+                    [[t] * (n - 2) + [u] for t in prev_tokens
+                     for u in prev_tokens]
+
+                for prev in prevs:
+                    prob_sum = sum(model.prob(token, prev) for token in tokens)
+                    self.assertAlmostEqual(prob_sum, 1.0, msg=(n, prev))
+
+    def test_unseen(self):
+        model = KneserNeyNGram(2, self.sents)
+
+        self.assertTrue(model.prob('salame', ['come']) > 0.0)
+        self.assertTrue(model.prob('pescado', ['salame']) > 0.0)
+
+    def test_packed(self):
+        for n in range(1, 4):
+            model = KneserNeyNGram(n, self.sents)
+            packed = KneserNeyNGram(n, self.sents, packed=True)
+
+            sents = self.sents + ['el gato come salame .'.split()]
+            for lp1, lp2 in zip(model.sents_log_prob(sents),
+                                packed.sents_log_prob(sents)):
+                self.assertAlmostEqual(lp1, lp2)
+
+    def test_save_load(self):
+        for packed in [False, True]:
+            model = KneserNeyNGram(3, self.sents, packed=packed)
+            with TemporaryDirectory() as tmp:
+                filename = os.path.join(tmp, 'model.bin')
+                model.save(filename)
+                loaded = KneserNeyNGram.load(filename)
+
+                self.assertEqual(loaded.n, 3)
+                self.assertEqual(loaded.V(), model.V())
+                self.assertEqual(loaded.discounts, model.discounts)
+                self.assertEqual(dict(loaded.cont.items()),
+                                 dict(model.cont.items()))
+                prev = ['gato', 'come']
+                self.assertAlmostEqual(loaded.prob('pescado', prev),
+                                       model.prob('pescado', prev))
+                self.assertAlmostEqual(loaded.prob('salame', prev),
+                                       model.prob('salame', prev))
+
+    def test_sents_log_prob(self):
+        model = KneserNeyNGram(2, self.sents)
+
+        sent = 'el gato'.split()
+        lp = log2(model.prob('el', ['<s>'])) + \
+            log2(model.prob('gato', ['el'])) + \
+            log2(model.prob('</s>', ['gato']))
+        self.assertAlmostEqual(model.sents_log_prob([sent])[0], lp)
+
+    def test_prune(self):
+        sents = self.sents + ['el gato come salmón .'.split()]
+        tokens = ['el', 'gato', 'come', 'pescado', '.', 'la', 'gata',
+                  'salmón', '</s>']
+        prev_tokens = tokens[:-1] + ['<s>']
+
+        for packed in [False, True]:
+            model = KneserNeyNGram(3, sents, packed=packed)
+            size = len(model.counts) + len(model.cont)
+            discounts = model.discounts
+            model.prune([2, 2, 2])
+
+            self.assertTrue(len(model.counts) + len(model.cont) < size)
+            self.assertEqual(model.V(), 9)
+            self.assertEqual(model.discounts, discounts)
+            for t in prev_tokens:
+                for u in prev_tokens:
+                    prob_sum = sum(model.prob(token, [t, u])
+                                   for token in tokens)
+                    self.assertAlmostEqual(prob_sum, 1.0, msg=(t, u))
+
+    def test_prune_save_load(self):
+        sents = self.sents + ['el gato come salmón .'.split()]
+        tokens = ['el', 'gato', 'come', 'pescado', '.', 'la', 'gata',
+                  'salmón', '</s>']
+        prev_tokens = tokens[:-1] + ['<s>']
+
+        for packed in [False, True]:
+            model = KneserNeyNGram(3, sents, packed=packed)
+            model.prune([2, 2, 2])
+            with TemporaryDirectory() as tmp:
+                filename = os.path.join(tmp, 'model.bin')
+                model.save(filename)
+                loaded = KneserNeyNGram.load(filename)
+
+                self.assertEqual(loaded.V(), 9)
+                self.assertEqual(loaded.discounts, model.discounts)
+                for lp1, lp2 in zip(loaded.sents_log_prob(sents),
+                                    model.sents_log_prob(sents)):
+                    self.assertAlmostEqual(lp1, lp2)
+                for t in prev_tokens:
+                    for u in prev_tokens:
+                        prob_sum = sum(loaded.prob(token, [t, u])
+                                       for token in tokens)
+                        self.assertAlmostEqual(prob_sum, 1.0, msg=(t, u))
+
+    def test_prune_update(self):
+        sents = self.sents + ['el gato come salmón .'.split()]
+        more = ['el perro come salmón .'.split()]
+        tokens = ['el', 'gato', 'come', 'pescado', '.', 'la', 'gata',
+                  'salmón', 'perro', '</s>']
+        prev_tokens = tokens[:-1] + ['<s>']
+
+        for packed in [False, True]:
+            model = KneserNeyNGram(3, sents, packed=packed)
+            model.prune([2, 2, 2])
+            model.update(more)
+
+            self.assertEqual(model.V(), 10)
+            for t in prev_tokens:
+                for u in prev_tokens:
+                    prob_sum = sum(model.prob(token, [t, u])
+                                   for token in tokens)
+                    self.assertAlmostEqual(prob_sum, 1.0, msg=(t, u))
+
+    def test_update(self):
+        more = ['el gato come salame .'.split()]
+        for packed in [False, True]:
+            model = KneserNeyNGram(3, self.sents + more, packed=packed)
+            updated = KneserNeyNGram(3, self.sents, packed=packed,
+                                     cache_size=100)
+            updated.sents_log_prob(more)
+            updated.update(more)
+
+            self.assertEqual(updated.V(), model.V())
+            for lp1, lp2 in zip(updated.sents_log_prob(self.sents + more),
+                                model.sents_log_prob(self.sents + more)):
+                self.assertAlmostEqual(lp1, lp2)
+
+    def test_continuations(self):
+        for packed in [False, True]:
+            model = KneserNeyNGram(3, self.sents, packed=packed)
+
+            self.assertEqual(model.continuations(('<s>', '<s>')),
+                             {'el': 1, 'la': 1})
+            # continuation counts of the lower orders
+            self.assertEqual(model.continuations(('.',)), {'</s>': 2})
+            self.assertEqual(model.continuations(())['come'], 2)
+
+    def test_continuations_pickle(self):
+        model = KneserNeyNGram(3, self.sents)
+        model.continuations(('.',))
+        model.continuations(('<s>', '<s>'))
+        loaded = pickle.loads(pickle.dumps(model))
+
+        # the index is not pickled, but rebuilt for the loaded tables
+        self.assertEqual(loaded.index, {})
+        self.assertEqual(loaded.continuations(('.',)), {'</s>': 2})
+        self.assertEqual(loaded.continuations(('<s>', '<s>')),
+                         {'el': 1, 'la': 1})
@@ -0,0 +1,180 @@
+# https://docs.python.org/3/library/unittest.html
+from unittest import TestCase
+from math import log2
+import os
+import pickle
+from tempfile import TemporaryDirectory
+
+from languagemodeling.ngram import NGram, SHARD_SIZE, default_shard_size
+
+
+class TestPackedNGram(TestCase):
+
+    def setUp(self):
+        self.sents = [
+            'el gato come pescado .'.split(),
+            'la gata come salmón .'.split(),
+        ]
+
+    def test_counts(self):
+        for n in range(1, 4):
+            ngram = NGram(n, self.sents)
+            packed = NGram(n, self.sents, packed=True)
+
+            counts = dict(ngram.counts)
+            self.assertEqual(dict(packed.counts.items()), counts)
+            self.assertEqual(len(packed.counts), len(counts))
+
+            for gram, c in counts.items():
+                self.assertEqual(packed.counts[gram], c, gram)
+
+    def test_unseen(self):
+        packed = NGram(2, self.sents, packed=True)
+
+        self.assertEqual(packed.counts[('come', 'salame')], 0)
+        self.assertEqual(packed.counts[('come', 'come')], 0)
+        self.assertEqual(packed.counts[('el', 'gato', 'come')], 0)
+
+    def test_prob(self):
+        ngram = NGram(2, self.sents)
+        packed = NGram(2, self.sents, packed=True)
+
+        probs = {
+            ('pescado', 'come'): 0.5,
+            ('salmón', 'come'): 0.5,
+            ('salame', 'come'): 0.0,
+            ('gato', 'el'): 1.0,
+        }
+        for (token, prev), p in probs.items():
+            self.assertEqual(packed.prob(token, [prev]), p)
+            self.assertEqual(packed.prob(token, [prev]),
+                             ngram.prob(token, [prev]))
+
+    def test_pickle(self):
+        packed = NGram(3, self.sents, packed=True)
+        loaded = pickle.loads(pickle.dumps(packed))
+
+        self.assertEqual(dict(loaded.counts.items()),
+                         dict(packed.counts.items()))
+        self.assertEqual(loaded.prob('come', ['el', 'gato']), 1.0)
+
+    def test_save_load(self):
+        for packed in [False, True]:
+            ngram = NGram(2, self.sents, packed=packed)
+            with TemporaryDirectory() as tmp:
+                filename = os.path.join(tmp, 'model.bin')
+                ngram.save(filename)
+                loaded = NGram.load(filename)
+
+                self.assertEqual(loaded.n, 2)
+                counts = {gram: c for gram, c in ngram.counts.items() if c}
+                self.assertEqual(dict(loaded.counts.items()), counts)
+                self.assertEqual(loaded.prob('pescado', ['come']), 0.5)
+                self.assertEqual(loaded.prob('salame', ['come']), 0.0)
+
+    def test_chunks(self):
+        sents = self.sents + [['.'], []] + self.sents[::-1]
+        for n in range(1, 4):
+            ngram = NGram(n, sents)
+            for chunk_size in [1, 2, 10]:
+                chunked = NGram(n, iter(sents), chunk_size=chunk_size)
+
+                self.assertEqual(dict(chunked.counts.items()),
+                                 dict(ngram.counts))
+
+    def test_workers(self):
+        sents = self.sents * 3
+        for n in range(1, 4):
+            ngram = NGram(n, sents)
+            for packed, chunk_size in [(False, None), (True, None), (True, 2)]:
+                # several shards, with n-grams missing from the first one
+                parallel = NGram(n, sents, packed=packed,
+                                 chunk_size=chunk_size, workers=2,
+                                 shard_size=1)
+
+                self.assertEqual(dict(parallel.counts.items()),
+                                 dict(ngram.counts))
+
+    def test_default_shard_size(self):
+        self.assertEqual(default_shard_size([[]] * 100, 5), 5)
+        self.assertEqual(default_shard_size([[]] * 3, 5), 1)
+        self.assertEqual(default_shard_size([[]] * 10 ** 6, 2), SHARD_SIZE)
+        self.assertEqual(default_shard_size(iter([]), 2), SHARD_SIZE)
+
+    def test_sents_log_prob(self):
+        sents = [
+            'el gato come pescado .'.split(),
+            'la gata come pescado .'.split(),
+            'el gato come salame .'.split(),  # 'salame' unseen
+            'la la la'.split(),  # 'la' after 'la' unseen
+            'el'.split(),  # no bigrams
+        ]
+        log_probs = [
+            log2(0.5),  # after 'come': 'pescado' and 'salmón' have prob 0.5.
+            log2(0.5),
+            float('-inf'),
+            float('-inf'),
+            0.0,
+        ]
+
+        for packed in [False, True]:
+            ngram = NGram(2, self.sents, packed=packed)
+            result = ngram.sents_log_prob(sents)
+
+            self.assertEqual(len(result), len(sents))
+            for lp, expected in zip(result, log_probs):
+                self.assertAlmostEqual(lp, expected)
+
+        ngram = NGram(1, self.sents, packed=True)
+        result = ngram.sents_log_prob(sents[:2])
+        for lp in result:
+            self.assertAlmostEqual(lp, 2 * log2(2 / 10.0) + 3 * log2(1 / 10.0))
+
+    def test_prune(self):
+        sents = self.sents + ['el gato come salmón .'.split()]
+        for n in range(1, 4):
+            ngram = NGram(n, sents)
+            packed = NGram(n, sents, packed=True)
+            ngram.prune([2] * n)
+            packed.prune([2] * n)
+
+            self.assertEqual(dict(packed.counts.items()), dict(ngram.counts))
+            for gram, c in ngram.counts.items():
+                self.assertTrue(len(gram) < n or c >= 2, gram)
+
+    def test_prune_all(self):
+        for packed in [False, True]:
+            ngram = NGram(2, self.sents, packed=packed)
+            ngram.prune([1, 5])
+
+            inf = float('-inf')
+            self.assertEqual(ngram.sents_log_prob(self.sents), [inf, inf])
+
+    def test_update(self):
+        more = ['el perro come salame .'.split()] + \
+            [['w{}'.format(i) for i in range(20)]] * 2  # grows the key bits
+        for n in range(1, 4):
+            ngram = NGram(n, self.sents + more)
+            for packed in [False, True]:
+                updated = NGram(n, self.sents, packed=packed)
+                updated.update(more)
+
+                self.assertEqual(dict(updated.counts.items()),
+                                 dict(ngram.counts))
+
+    def test_continuations(self):
+        for packed in [False, True]:
+            ngram = NGram(2, self.sents, packed=packed)
+
+            self.assertEqual(ngram.continuations(['come']),
+                             {'pescado': 1, 'salmón': 1})
+            self.assertEqual(ngram.continuations(['el']), {'gato': 1})
+            self.assertEqual(ngram.continuations(['.']), {})
+            self.assertEqual(ngram.continuations(['salame']), {})
+
+            ngram = NGram(1, self.sents, packed=packed)
+            self.assertEqual(sum(ngram.continuations([]).values()), 10)
+
+            ngram = NGram(3, self.sents, packed=packed)
+            self.assertEqual(ngram.continuations(['gata', 'come']),
+                             {'salmón': 1})
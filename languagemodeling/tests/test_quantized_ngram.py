@@ -0,0 +1,63 @@
+# https://docs.python.org/3/library/unittest.html
+from unittest import TestCase
+import os
+from tempfile import TemporaryDirectory
+
+from languagemodeling.ngram import NGram, KneserNeyNGram, QuantizedNGram
+
+
+class TestQuantizedNGram(TestCase):
+
+    def setUp(self):
+        self.sents = [
+            'el gato come pescado .'.split(),
+            'la gata come salmón .'.split(),
+            'el gato come salmón .'.split(),
+        ]
+        self.tokens = ['el', 'gato', 'come', 'pescado', '.', 'la', 'gata',
+                       'salmón', '</s>', 'salame']
+
+    def test_ngram(self):
+        ngram = NGram(2, self.sents)
+        model = QuantizedNGram(ngram, bits=16)
+
+        for prev in self.tokens:
+            for token in self.tokens:
+                if ngram.counts.get((prev,)):
+                    p = ngram.prob(token, [prev])
+                else:
+                    p = 0.0
+                self.assertAlmostEqual(model.prob(token, [prev]), p, places=4)
+
+    def test_kneser_ney(self):
+        for n in range(1, 4):
+            kn = KneserNeyNGram(n, self.sents)
+            model = QuantizedNGram(kn, bits=16)
+
+            prevs = [[]] if n == 1 else \
+                [[t] * (n - 2) + [u] for t in self.tokens + ['<s>']
+                 for u in self.tokens + ['<s>']]
+            for prev in prevs:
+                for token in self.tokens:
+                    self.assertAlmostEqual(model.prob(token, prev),
+                                           kn.prob(token, prev), places=3)
+
+    def test_8bits(self):
+        kn = KneserNeyNGram(3, self.sents)
+        model = QuantizedNGram(kn, bits=8)
+
+        for lp1, lp2 in zip(model.sents_log_prob(self.sents),
+                            kn.sents_log_prob(self.sents)):
+            self.assertAlmostEqual(lp1, lp2, delta=0.1)
+
+    def test_save_load(self):
+        kn = KneserNeyNGram(3, self.sents, packed=True)
+        model = QuantizedNGram(kn)
+        with TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'model.bin')
+            model.save(filename)
+            loaded = QuantizedNGram.load(filename)
+
+            self.assertEqual(loaded.sents_log_prob(self.sents),
+                             model.sents_log_prob(self.sents))
+            self.assertEqual(loaded.scored_tokens(self.sents[0]), 6)
@@ -0,0 +1,39 @@
+# https://docs.python.org/3/library/unittest.html
+from unittest import TestCase
+
+from languagemodeling.ngram import windows, padded, pad
+
+
+class TestWindows(TestCase):
+
+    def test_windows(self):
+        sent = 'el gato come pescado .'.split()
+
+        self.assertEqual(list(windows(sent, 1)),
+                         [(w,) for w in sent])
+        self.assertEqual(list(windows(sent, 2)), [
+            ('el', 'gato'),
+            ('gato', 'come'),
+            ('come', 'pescado'),
+            ('pescado', '.'),
+        ])
+        self.assertEqual(list(windows(sent, 5)), [tuple(sent)])
+        self.assertEqual(list(windows(sent, 6)), [])
+        self.assertEqual(list(windows([], 2)), [])
+
+    def test_windows_iterator(self):
+        sent = 'el gato come pescado .'.split()
+
+        self.assertEqual(list(windows(iter(sent), 3)),
+                         list(windows(sent, 3)))
+
+    def test_padded(self):
+        sent = 'el gato come pescado .'.split()
+
+        for n in [1, 2, 3]:
+            self.assertEqual(list(padded(sent, n)), pad(sent, n))
+
+        self.assertEqual(list(windows(padded(['hola'], 2), 2)), [
+            ('<s>', 'hola'),
+            ('hola', '</s>'),
+        ])
@@ -1,3 +1,5 @@
+# https://docs.python.org/3/library/itertools.html
+from itertools import chain
 
 
 class BaselineTagger:
@@ -15,6 +17,14 @@ class BaselineTagger:
         """
         return [self.tag_word(w) for w in sent]
 
+    def tag_sents(self, sents):
+        """Tag a batch of sentences, tagging each distinct word once.
+
+        sents -- list of sentences.
+        """
+        tags = {w: self.tag_word(w) for w in set(chain.from_iterable(sents))}
+        return [[tags[w] for w in sent] for sent in sents]
+
     def tag_word(self, w):
         """Tag a word.
 
@@ -1,18 +1,24 @@
 """Evaulate a tagger.
 
 Usage:
-  eval.py -i <file>
+  eval.py -i <file> [-s <size>] [-j <workers>]
   eval.py -h | --help
 
 Options:
   -i <file>     Tagging model file.
+  -s <size>     Sentences tagged per batch [default: 100].
+  -j <workers>  Tag in parallel with this many processes.
   -h --help     Show this screen.
 """
+from collections import defaultdict
 from docopt import docopt
+from multiprocessing import Pool
 import pickle
 import sys
+import time
 
 from corpus.ancora import SimpleAncoraCorpusReader
+from corpus.util import iter_chunks
 
 
 def progress(msg, width=None):
@@ -23,38 +29,98 @@ def progress(msg, width=None):
     sys.stdout.flush()
 
 
-if __name__ == '__main__':
-    opts = docopt(__doc__)
+def load(filename):
+    """Load the global model, in the main process and in each worker.
 
-    # load the model
-    filename = opts['-i']
+    filename -- the model file.
+    """
+    global model
     f = open(filename, 'rb')
     model = pickle.load(f)
     f.close()
 
-    # load the data
-    files = '3LB-CAST/.*\.tbf\.xml'
-    corpus = SimpleAncoraCorpusReader('ancora/ancora-2.0/', files)
-    sents = list(corpus.tagged_sents())
 
-    # tag
-    hits, total = 0, 0
-    n = len(sents)
-    for i, sent in enumerate(sents):
-        word_sent, gold_tag_sent = zip(*sent)
+def evaluate(batch):
+    """Tag a batch of tagged sentences with the global model. Returns the
+    hits, the number of tokens, a dict from gold tags to their hits and
+    tokens, and the number of sentences.
 
-        model_tag_sent = model.tag(word_sent)
-        assert len(model_tag_sent) == len(gold_tag_sent), i
+    batch -- list of tagged sentences.
+    """
+    word_sents = [[w for w, t in sent] for sent in batch]
+    model_tag_sents = model.tag_sents(word_sents)
 
-        # global score
-        hits_sent = [m == g for m, g in zip(model_tag_sent, gold_tag_sent)]
-        hits += sum(hits_sent)
+    hits, total = 0, 0
+    tag_counts = defaultdict(lambda: [0, 0])
+    for sent, model_tag_sent in zip(batch, model_tag_sents):
+        assert len(model_tag_sent) == len(sent)
+        for (w, g), m in zip(sent, model_tag_sent):
+            counts = tag_counts[g]
+            counts[0] += m == g
+            counts[1] += 1
+            hits += m == g
         total += len(sent)
+    return hits, total, dict(tag_counts), len(batch)
+
+
+def add_up(results, start):
+    """Add up the results of the batches, showing the progress. Returns the
+    hits, the number of tokens, a dict from gold tags to their hits and
+    tokens, and the number of sentences.
+
+    results -- iterable of the results of evaluate().
+    start -- time the tagging started.
+    """
+    hits, total, n = 0, 0, 0
+    tag_counts = defaultdict(lambda: [0, 0])
+    for batch_hits, batch_total, batch_tag_counts, batch_n in results:
+        hits += batch_hits
+        total += batch_total
+        n += batch_n
+        for tag, (tag_hits, tag_total) in batch_tag_counts.items():
+            counts = tag_counts[tag]
+            counts[0] += tag_hits
+            counts[1] += tag_total
         acc = float(hits) / total
+        elapsed = time.time() - start
+
+        progress('{} sents ({:.0f} sents/s) ({:2.2f}%)'.format(
+            n, n / elapsed, acc * 100))
+    return hits, total, tag_counts, n
 
-        progress('{:3.1f}% ({:2.2f}%)'.format(float(i) * 100 / n, acc * 100))
+
+if __name__ == '__main__':
+    opts = docopt(__doc__)
+
+    # load the model (each worker loads it too)
+    filename = opts['-i']
+    load(filename)
+
+    # load the data
+    files = '3LB-CAST/.*\.tbf\.xml'
+    corpus = SimpleAncoraCorpusReader('ancora/ancora-2.0/', files)
+    batches = iter_chunks(corpus.tagged_sents(), int(opts['-s']))
+
+    # tag
+    start = time.time()
+    workers = opts['-j'] and int(opts['-j'])
+    if workers and workers > 1:
+        with Pool(workers, initializer=load, initargs=(filename,)) as pool:
+            hits, total, tag_counts, n = add_up(
+                pool.imap(evaluate, batches), start)
+    else:
+        hits, total, tag_counts, n = add_up(map(evaluate, batches), start)
 
     acc = float(hits) / total
 
     print('')
     print('Accuracy: {:2.2f}%'.format(acc * 100))
+    print('Sentences/second: {:.1f}'.format(n / (time.time() - start)))
+
+    # accuracy of the most frequent gold tags
+    print('')
+    print('Tag      Tokens  Accuracy')
+    tags = sorted(tag_counts.items(), key=lambda x: -x[1][1])
+    for tag, (tag_hits, tag_total) in tags[:20]:
+        tag_acc = float(tag_hits) / tag_total
+        print('{:8} {:6d}  {:2.2f}%'.format(tag, tag_total, tag_acc * 100))
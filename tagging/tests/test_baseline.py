@@ -32,6 +32,17 @@ class TestBaselineTagger(TestCase):
         y = baseline.tag('el perro come salame .'.split())
         self.assertEqual(y, 'D N V N P'.split())
 
+    def test_tag_sents(self):
+        baseline = BaselineTagger(self.tagged_sents)
+
+        sents = [
+            'el gato come pescado .'.split(),
+            'el perro come salame .'.split(),
+            [],
+        ]
+        y = baseline.tag_sents(sents)
+        self.assertEqual(y, [baseline.tag(sent) for sent in sents])
+
     def test_unknown(self):
         baseline = BaselineTagger(self.tagged_sents)
 